@@ -0,0 +1,298 @@
+import argparse
+import sys
+import time
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+from engine import (
+    EXCLUDE_ROLES, REPORT_COLUMNS, read_report_rows, normalize_rows, prepare_rows, reduce_partials, build_summaries,
+    build_trends, extend_trends, build_cube, filter_cube, TREND_LEVELS, TREND_METRICS, TREND_WINDOWS, EXCEL_EPOCH
+)
+from export import SHEET_NAMES, render_sheet, workbook_bytes, export_frame
+from profiling import PROFILE_LOG_PATH, collect_profile, stage, append_profile_log
+from reference import reference_filter, reference_summaries, reference_collector_summary
+
+# Reproducible scaling benchmark: generates synthetic dialer exports, times ingest, the
+# summaries and both exports at each size, and checks every output against the original
+# per-group implementation. Examples (the second with dates in every form parse_dates reads):
+#   python benchmark.py --sizes 10000 100000 1000000 --log
+#   python benchmark.py --sizes 100000 --mixed-dates 0.5 --invalid-dates 0.01
+
+ENVIRONMENTS = ['ENV A', 'ENV B', 'ENV C', 'ENV D']
+
+# A synthetic export with the columns the reports read. Dates are dd-mm-YYYY text like the real
+# exports, accounts are numeric, talk times are HH:MM:SS. zero_talk and excluded_roles are the
+# fractions of rows the filter should drop; invalid_dates is the fraction with an unparseable date.
+def synthetic_export(rows, clients=40, collectors=800, accounts=None, days=30, zero_talk=0.3,
+                     excluded_roles=0.05, invalid_dates=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2024-01-01', periods=days).strftime('%d-%m-%Y').to_numpy(dtype=object)
+    date_values = dates[rng.integers(0, days, rows)]
+    date_values[rng.random(rows) < invalid_dates] = '31-02-2024'
+    
+    seconds = rng.integers(1, 900, rows)
+    seconds[rng.random(rows) < zero_talk] = 0
+    talk_times = pd.Series(seconds // 3600).astype(str).str.zfill(2) + ':' + \
+        pd.Series(seconds % 3600 // 60).astype(str).str.zfill(2) + ':' + \
+        pd.Series(seconds % 60).astype(str).str.zfill(2)
+    
+    roles = np.array(['Agent'] + EXCLUDE_ROLES, dtype=object)
+    role_values = np.where(rng.random(rows) < excluded_roles, roles[rng.integers(1, len(roles), rows)], roles[0])
+    return pd.DataFrame({
+        'Date': date_values,
+        'Client': np.array([f'CLIENT {i:03d}' for i in range(clients)], dtype=object)[rng.integers(0, clients, rows)],
+        'ENVIRONMENT': np.array(ENVIRONMENTS, dtype=object)[rng.integers(0, len(ENVIRONMENTS), rows)],
+        'Collector': np.array([f'agent{i:04d}' for i in range(collectors)], dtype=object)[rng.integers(0, collectors, rows)],
+        'Account': 100000000 + rng.integers(0, accounts or max(rows // 3, 1), rows),
+        'Role': role_values,
+        'Talk Time Duration': talk_times.to_numpy(dtype=object)
+    }, columns=REPORT_COLUMNS)
+
+# Other ways an export can hold a date: a datetime cell, an Excel serial number, or text in another
+# format the engine reads (at most one per shape, so none of them is ambiguous). Unparseable dates
+# become Excel serials outside what the reports can hold: 0 (before 1900-01-01) and 2958465
+# (9999-12-31, a valid Excel date but past what datetime64[ns] holds).
+MIXED_DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%d %b %Y', '%B %d, %Y', '%Y-%m-%d %H:%M:%S']
+OUT_OF_RANGE_SERIALS = [0, 2958465]
+
+# A copy of a synthetic export with the given fraction of its dates written one of the other ways,
+# picked at random. Datetime cells and the text with a time carry a random time of day. The days
+# don't change, so the reference still reads the dd-mm-YYYY dates of the original frame.
+def mix_date_formats(df, fraction, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.to_datetime(df['Date'], format='%d-%m-%Y', errors='coerce')
+    times = dates + pd.to_timedelta(rng.integers(0, 86400, len(df)), unit='s')
+    picked = rng.random(len(df)) < fraction
+    kinds = rng.integers(0, len(MIXED_DATE_FORMATS) + 2, len(df))
+    
+    mixed = df['Date'].astype(object).to_numpy(copy=True)
+    valid = picked & dates.notna().to_numpy()
+    for kind in range(len(MIXED_DATE_FORMATS) + 2):
+        rows = valid & (kinds == kind)
+        if kind == 0:
+            mixed[rows] = times[rows].astype(object).to_numpy()
+        elif kind == 1:
+            mixed[rows] = (dates[rows] - pd.Timestamp(EXCEL_EPOCH)).dt.days.tolist()
+        else:
+            date_format = MIXED_DATE_FORMATS[kind - 2]
+            mixed[rows] = (times if '%H' in date_format else dates)[rows].dt.strftime(date_format).to_numpy()
+    invalid = picked & dates.isna().to_numpy()
+    mixed[invalid] = np.array(OUT_OF_RANGE_SERIALS, dtype=object)[rng.integers(0, len(OUT_OF_RANGE_SERIALS), invalid.sum())]
+    return df.assign(Date=mixed)
+
+# The synthetic export as .xlsx bytes, written row by row in constant memory (datetimes as date cells)
+def export_workbook(df):
+    output = BytesIO()
+    workbook = xlsxwriter.Workbook(
+        output, {'in_memory': True, 'constant_memory': True, 'default_date_format': 'dd-mm-yyyy hh:mm:ss'}
+    )
+    worksheet = workbook.add_worksheet('Export')
+    worksheet.write_row(0, 0, df.columns.tolist())
+    for row_num, row in enumerate(df.itertuples(index=False), start=1):
+        worksheet.write_row(row_num, 0, row)
+    workbook.close()
+    return output.getvalue()
+
+# Ingest one export the way the app does on a cold upload (no ingest cache), then build the
+# summaries, the trends and both kinds of export. Stage timings go to the active profile.
+def run_pipeline(data):
+    with stage('ingest') as info:
+        with stage('read') as read_info:
+            df = read_report_rows(data)
+            read_info['rows'] = len(df)
+        with stage('normalize') as normalize_info:
+            df, _ = normalize_rows(df)
+            normalize_info['rows'] = len(df)
+        df_filtered = prepare_rows(df)
+        with stage('reduce') as reduce_info:
+            partials = reduce_partials(df_filtered)
+            reduce_info['rows'] = len(partials)
+        info['rows'] = len(partials)
+    
+    with stage('summaries (all)') as info:
+        summaries = build_summaries(partials)
+        info['rows'] = sum(len(table) for table in summaries)
+    with stage('trends') as info:
+        trends = build_trends(partials)
+        info['rows'] = sum(len(frame) for frame in trends)
+    
+    single_exports = []
+    for table, sheet_name in zip(summaries, SHEET_NAMES):
+        with stage(f'export {sheet_name}') as info:
+            single_exports.append(workbook_bytes([render_sheet(table)], [sheet_name]))
+            info['rows'] = len(table)
+    with stage('export all categories') as info:
+        all_export = workbook_bytes([render_sheet(table) for table in summaries], SHEET_NAMES)
+        info['rows'] = sum(len(table) for table in summaries)
+    return partials, summaries, trends, single_exports, all_export
+
+# Compare the engine's tables with the reference tables; returns a list of mismatches
+def verify_tables(summaries, expected, label=''):
+    problems = []
+    for sheet_name, table, reference in zip(SHEET_NAMES, summaries, expected):
+        try:
+            pd.testing.assert_frame_equal(
+                table.reset_index(drop=True), reference.reset_index(drop=True), check_dtype=False, check_categorical=False
+            )
+        except AssertionError as error:
+            problems.append(f"{label}{sheet_name}: {error}")
+    return problems
+
+# Compare the engine's tables and workbooks with the reference tables; returns a list of mismatches
+def verify(summaries, single_exports, all_export, expected):
+    problems = verify_tables(summaries, expected)
+    
+    expected_sheets = [export_frame(reference).reset_index(drop=True) for reference in expected]
+    exported = [(sheet_name, data, sheet_name) for sheet_name, data in zip(SHEET_NAMES, single_exports)]
+    exported += [(f"all categories/{sheet_name}", all_export, sheet_name) for sheet_name in SHEET_NAMES]
+    for label, data, sheet_name in exported:
+        sheet = pd.read_excel(BytesIO(data), sheet_name=sheet_name, dtype=object)
+        wanted = expected_sheets[SHEET_NAMES.index(sheet_name)].astype(object)
+        try:
+            pd.testing.assert_frame_equal(sheet, wanted.where(wanted.notna(), np.nan), check_dtype=False)
+        except AssertionError as error:
+            problems.append(f"export {label}: {error}")
+    return problems
+
+# Compare the summaries of a client-filtered cube with the reference run on the same clients' rows.
+# Every other client is kept, so the cube's categoricals carry unused categories like a sidebar filter's.
+def verify_filtered(partials, df_filtered):
+    clients = sorted(df_filtered['Client'].dropna().unique())[1::2]
+    subset = filter_cube(build_cube(partials), clients=clients)
+    expected_rows = df_filtered[df_filtered['Client'].isin(clients)]
+    expected = reference_summaries(expected_rows) + (reference_collector_summary(expected_rows),)
+    return verify_tables(build_summaries(subset), expected, 'filtered ')
+
+# Trends the slow way: daily totals per group from a plain groupby, pandas' own rolling('<n>D') sums
+# and a cumulative sum per group, in build_trends' row and column order
+def reference_trends(partials, keys):
+    rows = partials.dropna(subset=keys + ['Date'])
+    days = rows.groupby(keys + ['Date'], observed=True).agg(
+        Calls=('Calls', 'sum'), Accounts=('Account', 'nunique'), Seconds=('Seconds', 'sum')
+    ).reset_index()
+    for key in keys:
+        days[key] = days[key].astype(object)
+    for metric in TREND_METRICS:
+        for window in TREND_WINDOWS:
+            rolling = days.set_index('Date').groupby(keys, observed=True)[metric].rolling(f'{window}D').sum()
+            days[f'{metric} {window}-day avg'] = rolling.to_numpy() / window
+        days[f'{metric} to date'] = days.groupby(keys, observed=True)[metric].cumsum()
+    return days
+
+# Compare build_trends with the slow reference, and trends extended twice with later days (the way the
+# app adds days to the history) with trends built from every day at once; returns a list of mismatches.
+# The second part runs on the days spread four apart, so the earlier trends reach back further than the
+# longest window and running totals are carried past the lookback (the gaps also check that days
+# without calls count as zero in the rolling averages).
+def verify_trends(partials, trends):
+    first_day = partials['Date'].min()
+    spread = partials.assign(Date=first_day + (partials['Date'] - first_day) * 4)
+    spread_trends = build_trends(spread)
+    checks = [
+        (f"{label}trends per {keys[-1].lower()}", frame, reference_trends(rows, keys))
+        for label, rows, frames in [('', partials, trends), ('spread-out ', spread, spread_trends)]
+        for frame, keys in zip(frames, TREND_LEVELS)
+    ]
+    dates = np.sort(spread['Date'].dropna().unique())
+    if len(dates) >= 3:
+        first_cut, second_cut = dates[len(dates) // 2], dates[len(dates) * 3 // 4]
+        extended = build_trends(spread[~(spread['Date'] >= first_cut)])
+        extended = extend_trends(extended, spread[(spread['Date'] >= first_cut) & (spread['Date'] < second_cut)])
+        extended = extend_trends(extended, spread[spread['Date'] >= second_cut])
+        checks += [
+            (f"extended trends per {keys[-1].lower()}", frame.sort_values(keys + ['Date'], kind='stable'), expected)
+            for frame, expected, keys in zip(extended, spread_trends, TREND_LEVELS)
+        ]
+    
+    problems = []
+    for label, frame, expected in checks:
+        try:
+            pd.testing.assert_frame_equal(
+                frame.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False, check_categorical=False
+            )
+        except AssertionError as error:
+            problems.append(f"{label}: {error}")
+    return problems
+
+# Averages that land exactly on .5 in the reference client/date and daily tables, i.e. how much of
+# the round-half-up rule the check actually exercised
+def half_way_averages(expected):
+    count = 0
+    for table in expected[:2]:
+        for column in ['TOTAL CONNECTED', 'TOTAL ACCOUNT']:
+            count += int(((table[column] / table['COLLECTOR']) % 1 == 0.5).sum())
+    return count
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Time ingest, summaries and exports on synthetic dialer exports.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help="rows per synthetic export")
+    parser.add_argument('--clients', type=int, default=40)
+    parser.add_argument('--collectors', type=int, default=800)
+    parser.add_argument('--accounts', type=int, default=None, help="distinct accounts (default: a third of the rows)")
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--zero-talk', type=float, default=0.3, help="fraction of rows with 00:00:00 talk time")
+    parser.add_argument('--excluded-roles', type=float, default=0.05, help="fraction of rows with an excluded role")
+    parser.add_argument('--invalid-dates', type=float, default=0.0, help="fraction of rows with an unparseable date")
+    parser.add_argument(
+        '--mixed-dates', type=float, default=0.0,
+        help="fraction of rows whose date is written as a datetime cell, an Excel serial or other text (see MIXED_DATE_FORMATS)"
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--trace-memory', action='store_true',
+        help="also record each stage's allocation peak (tracing slows the timed stages down several times)"
+    )
+    parser.add_argument('--no-verify', action='store_true', help="skip the (slow) reference implementation check")
+    parser.add_argument(
+        '--log', nargs='?', const=PROFILE_LOG_PATH, default=None,
+        help=f"append each run to a JSON-lines log (default path: {PROFILE_LOG_PATH})"
+    )
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    failed = False
+    for rows in args.sizes:
+        df = synthetic_export(
+            rows, args.clients, args.collectors, args.accounts, args.days,
+            args.zero_talk, args.excluded_roles, args.invalid_dates, args.seed
+        )
+        data = export_workbook(mix_date_formats(df, args.mixed_dates, args.seed) if args.mixed_dates else df)
+        print(f"\n{rows:,} rows, {len(data) / 1e6:.1f} MB workbook", file=sys.stderr)
+    
+        started = time.perf_counter()
+        with collect_profile(trace_memory=args.trace_memory) as records:
+            partials, summaries, trends, single_exports, all_export = run_pipeline(data)
+        total_seconds = time.perf_counter() - started
+        print(pd.DataFrame(records).dropna(axis=1, how="all").to_string(index=False))
+        print(f"total {total_seconds:.2f}s")
+    
+        result = {}
+        if not args.no_verify:
+            started = time.perf_counter()
+            df_filtered = reference_filter(df)
+            expected = reference_summaries(df_filtered) + (reference_collector_summary(df_filtered),)
+            reference_seconds = time.perf_counter() - started
+            problems = verify(summaries, single_exports, all_export, expected)
+            problems += verify_filtered(partials, df_filtered)
+            problems += verify_trends(partials, trends)
+            result = {'reference_seconds': round(reference_seconds, 4), 'matches_reference': not problems}
+            print(f"reference {reference_seconds:.2f}s, {half_way_averages(expected)} averages on .5 checked: "
+                  + ("outputs match" if not problems else "MISMATCH"))
+            for problem in problems:
+                print(problem)
+            failed = failed or bool(problems)
+    
+        if args.log:
+            append_profile_log(
+                records, args.log, benchmark=True, rows=rows, clients=args.clients, collectors=args.collectors,
+                days=args.days, zero_talk=args.zero_talk, mixed_dates=args.mixed_dates, seed=args.seed,
+                trace_memory=args.trace_memory, input_bytes=len(data), total_seconds=round(total_seconds, 4), **result
+            )
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
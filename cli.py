@@ -0,0 +1,89 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+
+from engine import build_summaries, ingest_exports
+from export import SHEET_NAMES, REPORT_FILE_NAMES, ALL_REPORTS_FILE_NAME, render_sheet, workbook_bytes
+from store import connect_store, load_partials, count_invalid_rows
+
+# Headless report generator: the same summaries and workbooks as the Streamlit app,
+# without importing Streamlit. Example:
+#   python cli.py exports/*.xlsx -o reports/ --workers 8
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Generate the dialer summary workbooks from exported Excel files.")
+    parser.add_argument('inputs', nargs='+', help="dialer export workbooks (.xlsx)")
+    parser.add_argument('-o', '--output-dir', required=True, help="directory the report workbooks are written to")
+    parser.add_argument(
+        '--combine', action='store_true',
+        help="write one set of reports over all inputs instead of one set per input (in a subdirectory named after it)"
+    )
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument(
+        '--store', default=':memory:',
+        help="aggregate store to reuse between runs, so already-seen exports aren't parsed again (default: none)"
+    )
+    return parser.parse_args(argv)
+
+# Build the summaries for one set of partials and write the single-sheet workbooks plus the
+# all-categories workbook. Runs in worker processes; returns a status line for the caller to print.
+def write_reports(output_dir, partials):
+    if partials.empty:
+        return f"{output_dir}: no data remains after filtering, nothing written"
+    summaries = build_summaries(partials)
+    sheets = [render_sheet(table) for table in summaries]
+
+    os.makedirs(output_dir, exist_ok=True)
+    for sheet, sheet_name, file_name in zip(sheets, SHEET_NAMES, REPORT_FILE_NAMES):
+        with open(os.path.join(output_dir, file_name), 'wb') as f:
+            f.write(workbook_bytes([sheet], [sheet_name]))
+    with open(os.path.join(output_dir, ALL_REPORTS_FILE_NAME), 'wb') as f:
+        f.write(workbook_bytes(sheets, SHEET_NAMES))
+    return f"{output_dir}: {len(summaries[0])} client/date rows"
+
+# One output directory per input, named after the file (with a suffix when two inputs share a name)
+def per_input_dirs(output_dir, paths):
+    seen = {}
+    dirs = []
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        seen[stem] = seen.get(stem, 0) + 1
+        dirs.append(os.path.join(output_dir, stem if seen[stem] == 1 else f"{stem}_{seen[stem]}"))
+    return dirs
+
+def main(argv=None):
+    args = parse_args(argv)
+    exports = []
+    for path in args.inputs:
+        with open(path, 'rb') as f:
+            exports.append((os.path.basename(path), f.read()))
+
+    with closing(connect_store(args.store)) as conn:
+        digests, memory_report = ingest_exports(conn, exports, args.workers)
+        for file_name, before, after in memory_report:
+            print(f"{file_name}: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB after normalization", file=sys.stderr)
+        if args.combine:
+            jobs = [(args.output_dir, list(dict.fromkeys(digests)))]
+        else:
+            jobs = [(output_dir, [digest]) for output_dir, digest in zip(per_input_dirs(args.output_dir, args.inputs), digests)]
+
+        partials = []
+        for output_dir, job_digests in jobs:
+            invalid_count = count_invalid_rows(conn, job_digests)
+            if invalid_count:
+                print(f"{output_dir}: {invalid_count} rows have unparseable dates", file=sys.stderr)
+            partials.append(load_partials(conn, job_digests))
+
+    job_dirs = [output_dir for output_dir, _ in jobs]
+    if len(jobs) == 1:
+        results = [write_reports(job_dirs[0], partials[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=min(len(jobs), args.workers or os.cpu_count() or 1)) as pool:
+            results = list(pool.map(write_reports, job_dirs, partials))
+    for line in results:
+        print(line)
+
+if __name__ == '__main__':
+    main()
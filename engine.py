@@ -0,0 +1,690 @@
+import pandas as pd
+import numpy as np
+from io import BytesIO
+import os
+import multiprocessing
+import openpyxl
+from pandas.io.parsers import TextParser
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from profiling import stage, collect_profile, add_records, is_profiling, is_tracing_memory
+from store import (
+    content_digest, read_ingest_cache, write_ingest_cache, is_stored, store_partials, load_partials,
+    shared_frame_key, open_shared_frame, write_shared_frame
+)
+
+# Roles that are never counted as collectors
+EXCLUDE_ROLES = [
+    "Supervisor",
+    "Superuser",
+    "Dialer specialist",
+    "Supervisor (without Predictive Dialer Monitor)"
+]
+ZERO_TALK_TIME = "00:00:00"
+
+# The only columns of the dialer export the reports use
+REPORT_COLUMNS = ['Date', 'Client', 'ENVIRONMENT', 'Collector', 'Account', 'Role', 'Talk Time Duration']
+
+# Columns that identify one partial aggregate; calls and talk seconds are summed within each
+PARTIAL_KEYS = ['Date', 'Client', 'ENVIRONMENT', 'Collector', 'Account']
+
+# Convert a cell value the way pd.read_excel does before parsing (blank -> '', whole float -> int)
+def convert_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+# Stream the first sheet row by row, keeping only REPORT_COLUMNS and dropping excluded-role and
+# zero-talk-time rows before they are stored, so memory follows the surviving rows, not the file.
+# Surviving rows go through the same TextParser pd.read_excel uses, so dtypes and NA handling match.
+# The index is the sheet row number, so rows can be pointed out in the original file. Raises
+# ValueError when the header lacks any of the report columns.
+def read_report_rows(data):
+    workbook = openpyxl.load_workbook(BytesIO(data), read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(value) if value is not None else '' for value in next(rows, ())]
+        missing = [column for column in REPORT_COLUMNS if column not in header]
+        if missing:
+            raise ValueError(f"The export is missing report columns: {', '.join(missing)}")
+        positions = [header.index(column) for column in REPORT_COLUMNS]
+        width = max(positions) + 1
+        role_position = positions[REPORT_COLUMNS.index('Role')]
+        talk_position = positions[REPORT_COLUMNS.index('Talk Time Duration')]
+        exclude_roles = set(EXCLUDE_ROLES)
+        
+        kept_rows = [REPORT_COLUMNS]
+        kept_row_numbers = []
+        blank_row = [''] * len(REPORT_COLUMNS)
+        pending_blank_rows = []
+        for row_number, row in enumerate(rows, start=2):
+            if len(row) < width:
+                row = tuple(row) + (None,) * (width - len(row))
+            values = [convert_cell(row[position]) for position in positions]
+            if values == blank_row:
+                # Blank rows are kept like pd.read_excel does, except trailing ones
+                pending_blank_rows.append(row_number)
+                continue
+            if row[role_position] in exclude_roles or row[talk_position] == ZERO_TALK_TIME:
+                continue
+            kept_rows.extend([blank_row] * len(pending_blank_rows))
+            kept_row_numbers.extend(pending_blank_rows)
+            kept_rows.append(values)
+            kept_row_numbers.append(row_number)
+            pending_blank_rows = []
+    finally:
+        workbook.close()
+    
+    df = TextParser(kept_rows, header=0).read()
+    df.index = pd.Index(kept_row_numbers, dtype='int32', name='Row')
+    return df
+
+# Columns held as categoricals once loaded; talk time additionally gets an int32 seconds column
+CATEGORY_COLUMNS = ['Client', 'ENVIRONMENT', 'Collector', 'Account', 'Role', 'Talk Time Duration']
+
+# Account/Collector identifiers as strings, so the same ID matches across exports whether
+# a given workbook typed it as a number or as text
+def identifier_strings(values):
+    if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+        values = values.astype('Int64')
+    return values.astype(object).where(values.isna(), values.astype(str))
+
+# Formats tried for text dates, in order. The exports' own dd-mm-YYYY comes first, so dates that
+# read either way stay day-first; month-first is only picked when day-first doesn't fit.
+DATE_FORMATS = [
+    '%d-%m-%Y', '%d/%m/%Y', '%d.%m.%Y', '%Y-%m-%d', '%Y/%m/%d',
+    '%d-%m-%Y %H:%M:%S', '%d/%m/%Y %H:%M:%S', '%Y-%m-%d %H:%M:%S',
+    '%d-%b-%Y', '%d %b %Y', '%d %B %Y', '%b %d, %Y', '%B %d, %Y', '%m/%d/%Y', '%m-%d-%Y'
+]
+
+# Excel serial day numbers (counted from 1899-12-30) read as dates: from 1900-01-01 up to the last day
+# datetime64[ns] can hold (2262-04-11); anything outside is an invalid date, not an error
+EXCEL_EPOCH = '1899-12-30'
+EXCEL_SERIAL_RANGE = (1, (pd.Timestamp.max.date() - pd.Timestamp(EXCEL_EPOCH).date()).days)
+
+# The format in DATE_FORMATS that parses the most of texts (all of them, if one does) and the dates
+# it gives; (None, None) when none parses any
+def detect_date_format(texts):
+    best_format, best_dates, best_count = None, None, 0
+    for date_format in DATE_FORMATS:
+        dates = pd.to_datetime(texts, format=date_format, errors='coerce')
+        count = int(dates.notna().sum())
+        if count == len(texts):
+            return date_format, dates
+        if count > best_count:
+            best_format, best_dates, best_count = date_format, dates, count
+    return best_format, best_dates
+
+# Parse distinct text dates, grouped by shape (digits as 0, letters as a). The format is decided once
+# per shape from this export's own values, never carried over from another export, so a day-first
+# file reads the same whatever was parsed before it.
+def parse_text_dates(texts):
+    texts = pd.Series(texts, dtype=object).str.strip()
+    shapes = texts.str.replace(r'\d', '0', regex=True).str.replace(r'[^\W\d_]', 'a', regex=True)
+    parsed = pd.Series(pd.NaT, index=texts.index, dtype='datetime64[ns]')
+    for _, group in texts.groupby(shapes, sort=False):
+        date_format, dates = detect_date_format(group)
+        if date_format is not None:
+            parsed[group.index] = dates
+    return parsed
+
+# Parse a date column whatever Excel handed over: datetimes, Excel serial numbers, text in any of
+# DATE_FORMATS, or a mix. Each distinct value is parsed once, each kind in one vectorized call.
+# Returns datetime64 values aligned with the input; anything unparseable is NaT.
+def parse_dates(values):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.tz_localize(None) if values.dt.tz is not None else values
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(np.asarray(uniques, dtype=object))
+    kinds = uniques.map(lambda value: type(value).__name__)
+    parsed = pd.Series(pd.NaT, index=uniques.index, dtype='datetime64[ns]')
+    
+    is_datetime = kinds.isin(['datetime', 'date', 'Timestamp', 'datetime64'])
+    if is_datetime.any():
+        parsed[is_datetime] = pd.to_datetime(uniques[is_datetime], errors='coerce').to_numpy()
+    is_number = kinds.isin(['int', 'float', 'int64', 'float64', 'int32', 'float32'])
+    if is_number.any():
+        serials = uniques[is_number].astype(float)
+        serials = serials[(serials >= EXCEL_SERIAL_RANGE[0]) & (serials < EXCEL_SERIAL_RANGE[1])]
+        parsed[serials.index] = pd.to_datetime(serials, unit='D', origin=EXCEL_EPOCH, errors='coerce')
+    is_text = kinds == 'str'
+    if is_text.any():
+        parsed[is_text] = parse_text_dates(uniques[is_text])
+    
+    dates = parsed.to_numpy()
+    return pd.Series(
+        np.where(codes >= 0, dates[codes], np.datetime64('NaT')), index=values.index, dtype='datetime64[ns]'
+    )
+
+# Compact representation of the report columns: dates parsed once, repeated text as categoricals and
+# talk time parsed to int32 seconds. Dates that don't parse keep their text in 'Date Text' (empty
+# elsewhere) for the invalid-row preview. Returns the frame and its memory footprint (bytes) before and after.
+def normalize_rows(df):
+    before = int(df.memory_usage(deep=True).sum())
+    df = df[REPORT_COLUMNS].copy()
+    with stage('date parse') as info:
+        raw_dates = df['Date']
+        df['Date'] = parse_dates(raw_dates)
+        unparsed = df['Date'].isna().to_numpy()
+        invalid_text = raw_dates[unparsed]
+        date_text = pd.Series(np.nan, index=df.index, dtype=object)
+        date_text[unparsed] = invalid_text.astype(str).where(invalid_text.notna(), '')
+        df['Date Text'] = date_text.astype('category')
+        info['rows'] = len(df)
+    df['Collector'] = identifier_strings(df['Collector'])
+    df['Account'] = identifier_strings(df['Account'])
+    for column in CATEGORY_COLUMNS:
+        df[column] = df[column].astype('category')
+    df['Talk Seconds'] = talk_time_seconds(df['Talk Time Duration']).astype('int32')
+    return df, (before, int(df.memory_usage(deep=True).sum()))
+
+# Normalized rows of an export, through the on-disk ingest cache. The memory figures are only
+# known when the export was actually parsed, so they are None on a cache hit.
+def load_report(data, digest=None):
+    digest = digest or content_digest(data)
+    df = read_ingest_cache(digest)
+    if df is not None:
+        return df, None
+    df, memory = normalize_rows(read_report_rows(data))
+    write_ingest_cache(digest, df)
+    return df, memory
+
+# Drop excluded-role and zero-talk-time rows (comparisons on the categoricals). read_report_rows
+# already drops them while streaming; this keeps frames that didn't come through it honest.
+def prepare_rows(df):
+    with stage('filter') as info:
+        df_filtered = df[~df["Role"].isin(EXCLUDE_ROLES)]
+        df_filtered = df_filtered[df_filtered["Talk Time Duration"] != ZERO_TALK_TIME]
+        info['rows'] = len(df_filtered)
+    return df_filtered
+
+# Reduce filtered rows to per-(date, client, environment, collector, account) call counts and talk seconds.
+# Groups keep their first-appearance order and missing keys are kept, so every summary level
+# (including the ENVIRONMENT/Client join order) comes out the same as from the raw rows.
+def reduce_partials(df_filtered):
+    frame = pd.DataFrame({
+        'Date': df_filtered['Date'].dt.normalize(),
+        'Client': df_filtered['Client'],
+        'ENVIRONMENT': df_filtered['ENVIRONMENT'],
+        'Collector': df_filtered['Collector'],
+        'Account': df_filtered['Account'],
+        'Seconds': df_filtered['Talk Seconds'].astype('int64')
+    })
+    return frame.groupby(PARTIAL_KEYS, sort=False, dropna=False, observed=True).agg(
+        Calls=('Seconds', 'size'),
+        Seconds=('Seconds', 'sum')
+    ).reset_index()
+
+# Rows whose date couldn't be parsed, as shown to the user: the sheet row, the date as it was in the
+# export and the other report columns
+def invalid_date_rows(df):
+    rows = df[df['Date'].isna()]
+    invalid_rows = rows[REPORT_COLUMNS].copy()
+    invalid_rows['Date'] = rows['Date Text']
+    invalid_rows.insert(0, 'Row', rows.index)
+    return invalid_rows.reset_index(drop=True)
+
+# Parse and reduce one export: returns its partials, the rows whose date couldn't be parsed, the
+# normalization memory figures and its stage timings (empty unless profile is set).
+# Runs in worker processes, so it only takes and returns picklable values.
+def ingest_export(data, digest=None, profile=False, trace_memory=False):
+    with collect_profile(profile, trace_memory) as records:
+        with stage('load') as info:
+            df, memory = load_report(data, digest)
+            info['rows'] = len(df)
+        df_filtered = prepare_rows(df)
+        invalid_rows = invalid_date_rows(df_filtered)
+        with stage('reduce') as info:
+            partials = reduce_partials(df_filtered)
+            info['rows'] = len(partials)
+    return partials, invalid_rows, memory, records
+
+# Raised by ingest_exports when its cancel event is set; exports stored before that stay stored
+class IngestCancelled(Exception):
+    pass
+
+# How often ingest_exports checks its cancel event while the workers are parsing
+CANCEL_CHECK_SECONDS = 0.5
+
+# Reduce every export not yet in the store, in parallel across a process pool, and store each one's
+# partials as soon as it is done. exports is a list of (file_name, bytes). Returns their digests (in
+# the order given) and, for each export normalized in this call, (file_name, bytes before, bytes after).
+# progress(done, total) is called after each stored export; setting the cancel event (a
+# threading.Event) raises IngestCancelled within CANCEL_CHECK_SECONDS. Exports not started yet are
+# dropped and those still being parsed finish in their worker without being stored (an exception
+# from progress does the same), so the caller's thread is free right away.
+def ingest_exports(conn, exports, max_workers=None, progress=None, cancel=None):
+    digests = [content_digest(data) for _, data in exports]
+    pending = {}
+    for digest, (file_name, data) in zip(digests, exports):
+        if digest not in pending and not is_stored(conn, digest):
+            pending[digest] = (file_name, data)
+    
+    memory_report = []
+    stored = []
+    def store_result(digest, result):
+        file_name = pending[digest][0]
+        partials, invalid_rows, memory, records = result
+        add_records([{**record, 'stage': f"{record['stage']} ({file_name})"} for record in records])
+        with stage(f'store ({file_name})') as info:
+            store_partials(conn, digest, file_name, partials, invalid_rows)
+            info['rows'] = len(partials)
+        if memory is not None:
+            memory_report.append((file_name, *memory))
+        stored.append(digest)
+        if cancel is not None and cancel.is_set():
+            raise IngestCancelled()
+        if progress is not None:
+            progress(len(stored), len(pending))
+    
+    if not pending:
+        return digests, memory_report
+    profile, trace_memory = is_profiling(), is_tracing_memory()
+    workers = min(len(pending), max_workers or os.cpu_count() or 1)
+    # Workers come from a forkserver: ingest runs inside the multi-threaded Streamlit server (and
+    # its job threads), where a forked child could inherit a lock some other thread was holding.
+    # A single export goes through the pool too, so that cancelling doesn't wait for its parse.
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('forkserver'))
+    try:
+        futures = {
+            pool.submit(ingest_export, data, digest, profile, trace_memory): digest
+            for digest, (_, data) in pending.items()
+        }
+        running = set(futures)
+        while running:
+            done, running = wait(running, timeout=CANCEL_CHECK_SECONDS, return_when=FIRST_COMPLETED)
+            for future in done:
+                store_result(futures[future], future.result())
+            if cancel is not None and cancel.is_set():
+                raise IngestCancelled()
+    except BaseException:
+        # Whatever stopped us (cancel, a failed file, an exception from progress), drop the files
+        # still queued and return without joining the pool; running parses finish on their own
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return digests, memory_report
+
+# Round half up the way the reports always have (.5 and above goes up, anything below goes down)
+def round_half_up(values):
+    values = np.asarray(values, dtype=float)
+    return np.where(values % 1 >= 0.5, np.ceil(values), np.floor(values)).astype('int64')
+
+# Format whole seconds as HH:MM:SS strings
+def format_hms(seconds):
+    seconds = pd.Series(np.asarray(seconds)).astype('int64')
+    hours = (seconds // 3600).astype(str).str.zfill(2)
+    minutes = ((seconds % 3600) // 60).astype(str).str.zfill(2)
+    secs = (seconds % 60).astype(str).str.zfill(2)
+    return (hours + ':' + minutes + ':' + secs).values
+
+# Format "Month DD, YYYY - Month DD, YYYY" ranges, falling back to a message when a bound is missing
+def format_date_ranges(min_dates, max_dates, invalid_label):
+    min_dates = pd.Series(np.asarray(min_dates, dtype='datetime64[ns]'))
+    max_dates = pd.Series(np.asarray(max_dates, dtype='datetime64[ns]'))
+    labels = min_dates.dt.strftime('%B %d, %Y') + ' - ' + max_dates.dt.strftime('%B %d, %Y')
+    return np.where(min_dates.isna() | max_dates.isna(), invalid_label, labels)
+
+# Parse the talk time column to integer seconds, once per distinct value (missing/unparseable -> 0)
+def talk_time_seconds(talk_time):
+    talk_time = talk_time.astype('category')
+    parsed = pd.to_timedelta(talk_time.cat.categories.astype(str), errors='coerce') / pd.Timedelta(seconds=1)
+    parsed = np.append(np.nan_to_num(np.floor(np.asarray(parsed, dtype=float))), 0).astype('int64')
+    return pd.Series(parsed[talk_time.cat.codes.to_numpy()], index=talk_time.index)
+
+# Join the distinct values of a column per group, in order of first appearance
+def join_unique(frame, keys, column):
+    firsts = frame.drop_duplicates(keys + [column])
+    return firsts.groupby(keys, observed=True)[column].agg(', '.join).values
+
+# Exact, mergeable distinct counts. Collector and Account values are integer-coded once and each
+# level keeps its sorted unique (group, code) pairs packed into int64 keys, so rolling a level up
+# to a coarser one is a remap of group ids plus np.unique over those keys, never a rescan of rows.
+def unique_keys(keys):
+    keys = np.sort(keys)
+    first = np.empty(len(keys), dtype=bool)
+    first[:1] = True
+    np.not_equal(keys[1:], keys[:-1], out=first[1:])
+    return keys[first]
+
+def distinct_keys(group_ids, codes, n_codes):
+    keep = (group_ids >= 0) & (codes >= 0)
+    return unique_keys(group_ids[keep].astype('int64') * n_codes + codes[keep])
+
+def rollup_distinct(keys, n_codes, parent_ids):
+    parents = parent_ids[keys // n_codes]
+    keep = parents >= 0
+    return unique_keys(parents[keep].astype('int64') * n_codes + keys[keep] % n_codes)
+
+def count_distinct(keys, n_codes, n_groups):
+    return np.bincount(keys // n_codes, minlength=n_groups)
+
+# Calls, talk seconds and distinct collector/account keys per (date, client) cell. Cells with a
+# missing date or client are kept (and sorted last) because the client and overall levels count them.
+def base_cells(partials):
+    grouped = partials.groupby(['Date', 'Client'], dropna=False, observed=True)
+    cell_ids = grouped.ngroup().to_numpy()
+    cells = grouped.agg(Calls=('Calls', 'sum'), Seconds=('Seconds', 'sum'))
+    distinct = {}
+    for column in ['Collector', 'Account']:
+        codes, uniques = pd.factorize(partials[column])
+        n_codes = max(len(uniques), 1)
+        distinct[column] = (distinct_keys(cell_ids, codes, n_codes), n_codes)
+    return cells, distinct
+
+# Collector/connected/account/talk time totals for one summary level, rolled up from the base cells.
+# parent_ids maps every cell to its row in index, or -1 when the cell doesn't belong to this level.
+def level_totals(cells, distinct, parent_ids, index):
+    n_groups = len(index)
+    keep = parent_ids >= 0
+    totals = pd.DataFrame(index=index)
+    for column, name in [('Collector', 'COLLECTOR'), ('Calls', 'TOTAL CONNECTED'), ('Account', 'TOTAL ACCOUNT'), ('Seconds', 'TALK SECONDS')]:
+        if column in distinct:
+            keys, n_codes = distinct[column]
+            totals[name] = count_distinct(rollup_distinct(keys, n_codes, parent_ids), n_codes, n_groups)
+        else:
+            weights = cells[column].to_numpy()[keep]
+            totals[name] = np.bincount(parent_ids[keep], weights=weights, minlength=n_groups).astype('int64')
+    totals['AVG CONNECTED'] = round_half_up(totals['TOTAL CONNECTED'] / totals['COLLECTOR'])
+    totals['AVG ACCOUNT'] = round_half_up(totals['TOTAL ACCOUNT'] / totals['COLLECTOR'])
+    totals['AVG TALK SECONDS'] = np.floor(totals['TALK SECONDS'] / totals['COLLECTOR'])
+    return totals
+
+# Group ids of the cells along one index level, sorted like groupby and -1 for missing values
+def level_ids(cells, level):
+    ids, uniques = pd.factorize(cells.index.get_level_values(level), sort=True)
+    return ids, pd.Index(uniques, name=level)
+
+# Totals and per-collector averages shared by the client/date and daily tables
+def per_collector_columns(totals):
+    return {
+        'COLLECTOR': totals['COLLECTOR'].values,
+        'TOTAL CONNECTED': totals['TOTAL CONNECTED'].values,
+        'TOTAL ACCOUNT': totals['TOTAL ACCOUNT'].values,
+        'TOTAL TALK TIME': format_hms(totals['TALK SECONDS']),
+        'AVG CONNECTED': totals['AVG CONNECTED'].values,
+        'AVG ACCOUNT': totals['AVG ACCOUNT'].values,
+        'AVG TALKTIME': format_hms(totals['AVG TALK SECONDS'])
+    }
+
+# Columns of the collector leaderboard
+COLLECTOR_SUMMARY_COLUMNS = ['Date', 'CLIENT', 'RANK', 'COLLECTOR', 'TOTAL CONNECTED', 'TOTAL ACCOUNT', 'TOTAL TALK TIME']
+
+# Start-of-run flags for rows already sorted on the given key arrays
+def run_starts(*keys):
+    starts = np.zeros(len(keys[0]), dtype=bool)
+    starts[:1] = True
+    for key in keys:
+        starts[1:] |= key[1:] != key[:-1]
+    return starts
+
+# Calls, distinct accounts and talk seconds per combination of keys, sorted by the keys in the order
+# given; key columns come back as categoricals with sorted categories (the values present, as plain
+# values, even when a filtered cube's columns carry unused categories), and partials missing a key are
+# left out. One lexsort of the coded partials lines up every (keys, account) run, so the totals are
+# segment reductions over the sorted arrays.
+def segment_totals(partials, keys):
+    coded = [pd.factorize(partials[key], sort=True) for key in keys]
+    account_ids, _ = pd.factorize(partials['Account'])
+    keep = np.logical_and.reduce([ids >= 0 for ids, _ in coded])
+    if not keep.any():
+        return pd.DataFrame(columns=keys + ['Calls', 'Accounts', 'Seconds'])
+    
+    key_ids = [ids[keep] for ids, _ in coded]
+    order = np.lexsort([account_ids[keep]] + key_ids[::-1])
+    key_ids = [ids[order] for ids in key_ids]
+    account_ids = account_ids[keep][order]
+    calls = partials['Calls'].to_numpy(dtype='int64')[keep][order]
+    seconds = partials['Seconds'].to_numpy(dtype='int64')[keep][order]
+    
+    # An account counts once per segment and missing accounts (code -1) not at all
+    segment_starts = run_starts(*key_ids)
+    new_accounts = (segment_starts | run_starts(account_ids)) & (account_ids >= 0)
+    starts = np.flatnonzero(segment_starts)
+    segments = pd.DataFrame({
+        key: pd.Categorical.from_codes(ids[starts], categories=pd.Index(np.asarray(uniques)))
+        for key, ids, (_, uniques) in zip(keys, key_ids, coded)
+    })
+    segments['Calls'] = np.add.reduceat(calls, starts)
+    segments['Accounts'] = np.add.reduceat(new_accounts.astype('int64'), starts)
+    segments['Seconds'] = np.add.reduceat(seconds, starts)
+    return segments
+
+# Per (date, client, collector) calls, distinct accounts and talk time, ranked within each client and
+# day by calls with talk time breaking ties (equal on both share a rank, like 1, 2, 2, 4).
+# The ranks come from a sort of the (much shorter) collector segments, not of the partials.
+def collector_summary(partials):
+    segments = segment_totals(partials, ['Date', 'Client', 'Collector'])
+    if segments.empty:
+        return pd.DataFrame(columns=COLLECTOR_SUMMARY_COLUMNS)
+    segment_dates, segment_clients, segment_collectors = (
+        segments[key].cat.codes.to_numpy() for key in ['Date', 'Client', 'Collector']
+    )
+    segment_calls, segment_accounts, segment_seconds = (
+        segments[column].to_numpy() for column in ['Calls', 'Accounts', 'Seconds']
+    )
+    
+    # Leaderboard order within each (date, client), then competition ranks from the run starts
+    board = np.lexsort((segment_collectors, -segment_seconds, -segment_calls, segment_clients, segment_dates))
+    segment_dates, segment_clients, segment_collectors = segment_dates[board], segment_clients[board], segment_collectors[board]
+    segment_calls, segment_seconds, segment_accounts = segment_calls[board], segment_seconds[board], segment_accounts[board]
+    positions = np.arange(len(board))
+    group_starts = run_starts(segment_dates, segment_clients)
+    score_starts = group_starts | run_starts(segment_calls, segment_seconds)
+    ranks = np.maximum.accumulate(np.where(score_starts, positions, 0)) - np.maximum.accumulate(np.where(group_starts, positions, 0)) + 1
+    
+    return pd.DataFrame({
+        'Date': pd.DatetimeIndex(segments['Date'].cat.categories)[segment_dates].date,
+        'CLIENT': np.asarray(segments['Client'].cat.categories, dtype=object)[segment_clients],
+        'RANK': ranks,
+        'COLLECTOR': np.asarray(segments['Collector'].cat.categories, dtype=object)[segment_collectors],
+        'TOTAL CONNECTED': segment_calls,
+        'TOTAL ACCOUNT': segment_accounts,
+        'TOTAL TALK TIME': format_hms(segment_seconds)
+    }, columns=COLLECTOR_SUMMARY_COLUMNS)
+
+# Build the client/date, daily, overall, per-client and collector summaries from partial aggregates,
+# yielding each table as soon as it is done (in that order).
+# Sums and distinct counts are taken once per (date, client) cell and rolled up to every level,
+# so the raw rows (and even the partials) are never rescanned per level.
+def iter_summaries(partials):
+    with stage('summary base cells') as info:
+        cells, distinct = base_cells(partials)
+        date_ids, dates = level_ids(cells, 'Date')
+        client_ids, clients_index = level_ids(cells, 'Client')
+        info['rows'] = len(cells)
+    
+    # 1. Per Client and Date Summary
+    with stage('summary: client/date') as info:
+        complete = (date_ids >= 0) & (client_ids >= 0)
+        cell_ids = np.where(complete, np.cumsum(complete) - 1, -1)
+        client_date = level_totals(cells, distinct, cell_ids, cells.index[complete])
+        summary_table = pd.DataFrame({
+            'Date': client_date.index.get_level_values('Date').date,
+            'CLIENT': client_date.index.get_level_values('Client'),
+            'ENVIRONMENT': join_unique(partials, ['Date', 'Client'], 'ENVIRONMENT'),
+            **per_collector_columns(client_date)
+        })
+        info['rows'] = len(summary_table)
+    yield summary_table
+    
+    # 2. Summary Per Day
+    with stage('summary: daily') as info:
+        daily = level_totals(cells, distinct, date_ids, dates)
+        daily_summary_table = pd.DataFrame({
+            'Date': daily.index.date,
+            'CLIENT': join_unique(partials, ['Date'], 'Client'),
+            'ENVIRONMENT': join_unique(partials, ['Date'], 'ENVIRONMENT'),
+            **per_collector_columns(daily)
+        })
+        info['rows'] = len(daily_summary_table)
+    yield daily_summary_table
+    
+    # 3. Overall Summary, with the per-day averages taken from the daily table
+    with stage('summary: overall') as info:
+        overall = level_totals(cells, distinct, np.zeros(len(cells), dtype='int64'), pd.RangeIndex(1)).iloc[0]
+        overall_summary = pd.DataFrame({
+            'DATE RANGE': format_date_ranges([dates.min()], [dates.max()], "Invalid date range (check Date column)"),
+            'TOTAL COLLECTORS': [overall['COLLECTOR']],
+            'TOTAL CONNECTED': [overall['TOTAL CONNECTED']],
+            'TOTAL ACCOUNTS': [overall['TOTAL ACCOUNT']],
+            'TOTAL TALK TIME': format_hms([overall['TALK SECONDS']]),
+            'AVG AGENTS/DAY': round_half_up([daily['COLLECTOR'].mean()]),
+            'AVG CALLS/DAY': round_half_up([daily['TOTAL CONNECTED'].mean()]),
+            'AVG CONNECTED/DAY': round_half_up([daily['AVG CONNECTED'].mean()]),
+            'AVG ACCOUNTS/DAY': round_half_up([daily['TOTAL ACCOUNT'].mean()]),
+            'AVG TALKTIME/DAY': format_hms(np.floor([daily['AVG TALK SECONDS'].mean()]))
+        })
+        info['rows'] = len(overall_summary)
+    yield overall_summary
+    
+    # 4. Overall Per Client Summary, with the per-day averages taken from the client/date table
+    with stage('summary: client') as info:
+        clients = level_totals(cells, distinct, client_ids, clients_index)
+        client_dates = cells.reset_index().groupby('Client', observed=True)['Date'].agg(['min', 'max'])
+        per_day = client_date.groupby(level='Client', observed=True).mean().reindex(clients.index)
+        client_summary = pd.DataFrame({
+            'CLIENT': clients.index,
+            'DATE RANGE': format_date_ranges(client_dates['min'], client_dates['max'], "Invalid date range"),
+            'ENVIRONMENT': join_unique(partials, ['Client'], 'ENVIRONMENT'),
+            'COLLECTOR': clients['COLLECTOR'].values,
+            'TOTAL CONNECTED': clients['TOTAL CONNECTED'].values,
+            'TOTAL ACCOUNT': clients['TOTAL ACCOUNT'].values,
+            'TOTAL TALK TIME': format_hms(clients['TALK SECONDS']),
+            'AVG AGENTS/DAY': round_half_up(per_day['COLLECTOR']),
+            'AVG CALLS/DAY': round_half_up(per_day['TOTAL CONNECTED']),
+            'AVG ACCOUNTS/DAY': round_half_up(per_day['TOTAL ACCOUNT']),
+            'AVG TALKTIME/DAY': format_hms(np.floor(per_day['AVG TALK SECONDS'].fillna(0)))
+        })
+        info['rows'] = len(client_summary)
+    yield client_summary
+    
+    # 5. Collector leaderboard, straight from the partials
+    with stage('summary: collector') as info:
+        collector_table = collector_summary(partials)
+        info['rows'] = len(collector_table)
+    yield collector_table
+
+def build_summaries(partials):
+    return tuple(iter_summaries(partials))
+
+# Trend levels (per client, and per collector within a client), the daily metrics they follow and
+# the trailing windows, in days, of their rolling averages
+TREND_LEVELS = [['Client'], ['Client', 'Collector']]
+TREND_METRICS = ['Calls', 'Accounts', 'Seconds']
+TREND_WINDOWS = [7, 30]
+
+# Daily calls, distinct accounts and talk seconds per group of keys, sorted by keys then date
+def trend_days(partials, keys):
+    segments = segment_totals(partials, keys + ['Date'])
+    days = pd.DataFrame({key: segments[key].astype(object) for key in keys})
+    days['Date'] = segments['Date'].astype('datetime64[ns]')
+    for metric in TREND_METRICS:
+        days[metric] = segments[metric].astype('int64')
+    return days
+
+# Rolling and cumulative columns for daily totals sorted by keys then date. '<metric> <n>-day avg'
+# averages the trailing n calendar days (days without calls count as zero) and '<metric> to date'
+# runs from the group's first day. Both come from one running total per metric: a window sum is the
+# difference of two running totals, found with a searchsorted over (group, day) positions.
+def add_trend_columns(days, keys):
+    trends = days.reset_index(drop=True)
+    if trends.empty:
+        columns = [f'{metric} {window}-day avg' for metric in TREND_METRICS for window in TREND_WINDOWS]
+        return trends.reindex(columns=trends.columns.tolist() + columns + [f'{metric} to date' for metric in TREND_METRICS])
+    
+    groups = np.cumsum(run_starts(*(trends[key].to_numpy() for key in keys))) - 1
+    day_numbers = trends['Date'].to_numpy().astype('datetime64[D]').astype('int64')
+    day_numbers -= day_numbers.min()
+    positions = groups * (day_numbers.max() + max(TREND_WINDOWS) + 1) + day_numbers
+    window_starts = {window: np.searchsorted(positions, positions - window, side='right') for window in TREND_WINDOWS}
+    group_starts = np.flatnonzero(run_starts(groups))
+    for metric in TREND_METRICS:
+        running = np.cumsum(trends[metric].to_numpy(dtype='int64'))
+        before = np.concatenate([[0], running])
+        for window, starts in window_starts.items():
+            trends[f'{metric} {window}-day avg'] = (running - before[starts]) / window
+        trends[f'{metric} to date'] = running - before[group_starts][groups]
+    return trends
+
+# Per-client and per-collector trend frames (see TREND_LEVELS), one row per group and day
+def build_trends(partials):
+    return tuple(add_trend_columns(trend_days(partials, keys), keys) for keys in TREND_LEVELS)
+
+# Trends extended with partials of later days. Only the new days are aggregated: their rolling
+# windows reach back into the previous frames' last days, and their running totals carry on from
+# the previous ones. Returns None when the partials touch days the trends already cover, since
+# distinct accounts of a day can't be merged.
+def extend_trends(trends, partials):
+    dates = partials['Date'].dropna()
+    if dates.empty:
+        return trends
+    last_date = max(frame['Date'].max() for frame in trends)
+    if pd.isna(last_date):
+        return build_trends(partials)
+    if dates.min() <= last_date:
+        return None
+    
+    lookback_start = dates.min() - pd.Timedelta(days=max(TREND_WINDOWS))
+    cumulative = [f'{metric} to date' for metric in TREND_METRICS]
+    extended = []
+    for previous, keys in zip(trends, TREND_LEVELS):
+        lookback = previous.loc[previous['Date'] > lookback_start, keys + ['Date'] + TREND_METRICS]
+        frame = pd.concat([lookback, trend_days(partials, keys)], ignore_index=True)
+        frame = add_trend_columns(frame.sort_values(keys + ['Date'], kind='stable'), keys)
+        
+        # What each group had before the lookback rows, added to the running totals of the new days
+        carried = previous.groupby(keys, sort=False)[cumulative].last().sub(
+            lookback.groupby(keys, sort=False)[TREND_METRICS].sum().set_axis(cumulative, axis=1), fill_value=0
+        )
+        added = frame[frame['Date'] > last_date].reset_index(drop=True)
+        offsets = added[keys].merge(carried.reset_index(), on=keys, how='left')[cumulative].fillna(0)
+        added[cumulative] = (added[cumulative].to_numpy() + offsets.to_numpy()).astype('int64')
+        # Each group's rows stay in date order, which is all the next extension needs
+        extended.append(pd.concat([previous, added], ignore_index=True))
+    return tuple(extended)
+
+# Dimensions the drill-down filters select on, held as categoricals in the cube
+CUBE_DIMENSIONS = ['Client', 'ENVIRONMENT', 'Collector']
+
+# The drill-down cube: partials with categorical dimensions, built once per set of exports so a
+# filter is a lookup on small integer codes. Accounts stay in it (as a categorical too), so the
+# account totals of a filtered view are still exact distinct counts.
+def build_cube(partials):
+    cube = partials.copy()
+    for column in CUBE_DIMENSIONS + ['Account']:
+        cube[column] = cube[column].astype('category')
+    return cube
+
+# The cube of a set of stored exports, shared by every session through a memory-mapped snapshot.
+# The first session to ask for a set builds it from the aggregate store (or from partials, when the
+# caller already loaded them); the rest just map it.
+def shared_cube(conn, digests, partials=None):
+    key = shared_frame_key(digests)
+    cube = open_shared_frame(key)
+    if cube is None:
+        cube = build_cube(load_partials(conn, digests) if partials is None else partials)
+        mapped = open_shared_frame(key) if write_shared_frame(key, cube) else None
+        if mapped is not None:
+            cube = mapped
+    return cube
+
+# The values a dimension can be filtered on, sorted
+def cube_options(cube, column):
+    return cube[column].cat.categories.tolist()
+
+# Partials matching every given filter; None (or an empty selection) keeps everything. dates is an
+# inclusive (first, last) pair and also drops partials without a valid date.
+def filter_cube(cube, dates=None, clients=None, environments=None, collectors=None):
+    keep = np.ones(len(cube), dtype=bool)
+    if dates is not None:
+        values = cube['Date'].to_numpy()
+        keep &= (values >= np.datetime64(pd.Timestamp(dates[0]))) & (values <= np.datetime64(pd.Timestamp(dates[1])))
+    for column, selected in zip(CUBE_DIMENSIONS, [clients, environments, collectors]):
+        if selected:
+            # Code -1 (missing) picks the trailing False
+            allowed = np.append(cube[column].cat.categories.isin(selected), False)
+            keep &= allowed[cube[column].cat.codes.to_numpy()]
+    return cube if keep.all() else cube[keep]
@@ -0,0 +1,74 @@
+import pandas as pd
+from io import BytesIO
+import xlsxwriter
+
+# Sheet names and file names of the summary reports, in the order build_summaries returns them
+SHEET_NAMES = ["Client_Date_Summary", "Daily_Summary", "Overall_Summary", "Client_Summary", "Collector_Summary"]
+REPORT_FILE_NAMES = [
+    "dialer_client_date_summary_report.xlsx",
+    "dialer_daily_summary_report.xlsx",
+    "dialer_overall_summary_report.xlsx",
+    "dialer_overall_client_summary_report.xlsx",
+    "dialer_collector_summary_report.xlsx"
+]
+ALL_REPORTS_FILE_NAME = "dialer_all_categories_report.xlsx"
+
+# Cell styles shared by every exported sheet
+HEADER_FORMAT = {
+    'bold': True,
+    'bg_color': '#87CEEB',
+    'border': 1,
+    'align': 'center',
+    'valign': 'vcenter'
+}
+CELL_FORMAT = {'border': 1}
+
+# Prepare a summary table for export, with dates as dd-mm-YYYY strings
+def export_frame(df):
+    df_copy = df.copy()
+    if 'Date' in df_copy.columns:
+        if pd.api.types.is_datetime64_any_dtype(df_copy['Date']):
+            df_copy['Date'] = df_copy['Date'].dt.strftime('%d-%m-%Y')
+        elif pd.api.types.is_object_dtype(df_copy['Date']):
+            df_copy['Date'] = pd.to_datetime(df_copy['Date'], errors='coerce').dt.strftime('%d-%m-%Y')
+    return df_copy
+
+# Column width: the longest rendered value or header, plus padding
+def column_width(series, header):
+    if series.empty:
+        longest = 0
+    elif pd.api.types.is_integer_dtype(series):
+        longest = max(len(str(series.max())), len(str(series.min())))
+    else:
+        longest = series.astype(str).str.len().max()
+    return max(longest, len(str(header))) + 2
+
+# Render a table once for export: header, row values (missing as None) and column widths
+def render_sheet(df):
+    df_copy = export_frame(df)
+    rows = df_copy.astype(object).where(df_copy.notna(), None).to_numpy().tolist()
+    widths = [column_width(df_copy[col], col) for col in df_copy.columns]
+    return df_copy.columns.tolist(), rows, widths
+
+# Write one formatted worksheet from a rendered sheet, a whole row per call
+def write_sheet(workbook, formats, sheet, sheet_name):
+    header_format, cell_format = formats
+    header, rows, widths = sheet
+    worksheet = workbook.add_worksheet(sheet_name)
+    
+    worksheet.write_row(0, 0, header, header_format)
+    for row_num, row in enumerate(rows, start=1):
+        worksheet.write_row(row_num, 0, row, cell_format)
+    
+    for i, width in enumerate(widths):
+        worksheet.set_column(i, i, width)
+
+# Build an XLSX workbook with one formatted sheet per rendered sheet
+def workbook_bytes(sheets, sheet_names):
+    output = BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+    formats = (workbook.add_format(HEADER_FORMAT), workbook.add_format(CELL_FORMAT))
+    for sheet, sheet_name in zip(sheets, sheet_names):
+        write_sheet(workbook, formats, sheet, sheet_name)
+    workbook.close()
+    return output.getvalue()
@@ -0,0 +1,193 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+from engine import IngestCancelled, ingest_exports, iter_summaries, shared_cube, build_trends, extend_trends
+from export import SHEET_NAMES, render_sheet, workbook_bytes
+from profiling import collect_profile, stage
+from store import connect_store, stored_digests, load_partials, load_invalid_rows, count_invalid_rows
+
+# Background report jobs: parsing, the summaries and the workbooks run on a small thread pool while
+# the app polls for progress and shows each table as soon as it lands. Jobs are keyed by the uploaded
+# content and the history setting, so sessions looking at the same data share one job (and its
+# results, instead of each holding a copy). A job no session is waiting for any more is cancelled at
+# its next step; the last few finished jobs are kept for sessions that come back to the same data.
+# Parsing still fans out to worker processes inside the job (see ingest_exports).
+JOB_WORKERS = int(os.environ.get('SPM_JOB_WORKERS', '2'))
+FINISHED_JOBS_KEPT = 8
+
+# Key of the all-categories workbook in a job's workbooks
+ALL_REPORTS = 'all'
+
+# Unparseable-date rows loaded for display; the rest are only counted
+INVALID_ROWS_PREVIEW = 100
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='report-job')
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+
+class JobCancelled(Exception):
+    pass
+
+# One run of the pipeline. The worker thread publishes progress, a status line and results
+# (digests, memory_report, invalid_rows and invalid_count, cube, then tables one at a time, trends,
+# and workbooks one at a time); the app reads them through snapshot().
+class ReportJob:
+    def __init__(self, key, exports, include_history, profile=False, trace_memory=False):
+        self.key = key
+        self.exports = exports
+        self.include_history = include_history
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.holders = set()
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+        self.progress = 0.0
+        self.status = "Queued"
+        self.results = {}
+        self.records = []
+        self.error = None
+        self.done = False
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.results)
+
+    # Record progress and new results, and stop here if nobody is waiting for the job any more
+    def publish(self, progress, status, **results):
+        with self.lock:
+            self.progress = progress
+            self.status = status
+            self.results.update(results)
+        if self.cancelled:
+            raise JobCancelled()
+
+    def run(self):
+        try:
+            with collect_profile(self.profile, self.trace_memory) as records:
+                self.records = records
+                self.build()
+        except (JobCancelled, IngestCancelled):
+            self.status = "Cancelled"
+        except Exception as error:
+            self.error = error
+            self.status = "Failed"
+        finally:
+            self.exports = None
+            self.done = True
+
+    # Parsing takes the first half of the progress bar, the summaries and trends and the workbooks a quarter each
+    def build(self):
+        self.publish(0.0, "Parsing uploads")
+
+        def ingest_progress(done, total):
+            self.publish(0.5 * done / total, f"Parsed {done} of {total} new files")
+
+        with closing(connect_store()) as conn:
+            digests, memory_report = ingest_exports(
+                conn, self.exports, progress=ingest_progress, cancel=self.cancel_event
+            )
+            self.exports = None
+            if self.include_history:
+                digests = [digest for digest in stored_digests(conn) if digest not in digests] + digests
+            digests = tuple(dict.fromkeys(digests))
+            with stage('load partials') as info:
+                partials = load_partials(conn, digests)
+                invalid_rows = load_invalid_rows(conn, digests, INVALID_ROWS_PREVIEW)
+                invalid_count = count_invalid_rows(conn, digests)
+                info['rows'] = len(partials)
+            self.publish(
+                0.5, "Building summaries", digests=digests, memory_report=memory_report,
+                invalid_rows=invalid_rows, invalid_count=invalid_count
+            )
+            with stage('load filter cube'):
+                cube = shared_cube(conn, digests, partials)
+
+        if partials.empty:
+            self.publish(1.0, "Done", cube=cube, tables=None)
+            return
+        self.publish(0.5, "Building summaries", cube=cube, tables=())
+
+        tables = []
+        for table in iter_summaries(partials):
+            tables.append(table)
+            self.publish(0.5 + 0.2 * len(tables) / len(SHEET_NAMES), f"Built {SHEET_NAMES[len(tables) - 1]}", tables=tuple(tables))
+        
+        with stage('trends') as info:
+            trends = None
+            previous = earlier_trends(digests)
+            if previous is not None:
+                earlier_digests, earlier = previous
+                with closing(connect_store()) as conn:
+                    added = load_partials(conn, [digest for digest in digests if digest not in earlier_digests])
+                trends = extend_trends(earlier, added)
+            if trends is None:
+                trends = build_trends(partials)
+            info['rows'] = sum(len(frame) for frame in trends)
+        self.publish(0.75, "Built trends", trends=trends)
+
+        workbooks = {}
+        sheets = []
+        for table, sheet_name in zip(tables, SHEET_NAMES):
+            with stage(f'export {sheet_name}') as info:
+                sheets.append(render_sheet(table))
+                workbooks[sheet_name] = workbook_bytes([sheets[-1]], [sheet_name])
+                info['rows'] = len(table)
+            self.publish(0.75 + 0.25 * len(workbooks) / (len(SHEET_NAMES) + 1), f"Wrote {sheet_name} workbook", workbooks=dict(workbooks))
+        with stage('export all categories') as info:
+            workbooks[ALL_REPORTS] = workbook_bytes(sheets, SHEET_NAMES)
+            info['rows'] = sum(len(table) for table in tables)
+        self.publish(1.0, "Done", workbooks=dict(workbooks))
+
+# Digests and trends of the finished job covering the most of digests (and nothing else), so new
+# days can be added to its trends instead of aggregating the whole history again; None if there is none
+def earlier_trends(digests):
+    with _jobs_lock:
+        finished = [job.snapshot() for job in _jobs.values() if job.done]
+    candidates = [
+        (results['digests'], results['trends']) for results in finished
+        if 'trends' in results and set(results['digests']) <= set(digests)
+    ]
+    return max(candidates, key=lambda candidate: len(candidate[0]), default=None)
+
+# The job for key, joining a running or finished one when there is one and starting it otherwise.
+# holder identifies the session waiting for it.
+def acquire_job(key, exports, include_history, holder, profile=False, trace_memory=False):
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is None or job.cancelled:
+            job = ReportJob(key, exports, include_history, profile, trace_memory)
+            _jobs[key] = job
+            _executor.submit(job.run)
+        _jobs.move_to_end(key)
+        job.holders.add(holder)
+
+        # Sessions that went away never release their jobs, so finished jobs are dropped oldest
+        # first whoever still holds them (those sessions keep their own reference)
+        finished = [old for old in _jobs.values() if old.done]
+        for old in finished[:max(len(finished) - FINISHED_JOBS_KEPT, 0)]:
+            del _jobs[old.key]
+    return job
+
+# The holder stopped waiting for the job (e.g. it uploaded something else); cancel the job if it
+# was the last one and the job hasn't finished
+def release_job(job, holder):
+    with _jobs_lock:
+        job.holders.discard(holder)
+        if not job.holders and not job.done:
+            job.cancel_event.set()
+            if _jobs.get(job.key) is job:
+                del _jobs[job.key]
+
+# Cancel and forget every job (after the aggregate store was cleared)
+def clear_jobs():
+    with _jobs_lock:
+        for job in _jobs.values():
+            job.cancel_event.set()
+        _jobs.clear()
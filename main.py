@@ -1,474 +1,504 @@
 import streamlit as st
+import altair as alt
 import pandas as pd
-from io import BytesIO
-import math
+import numpy as np
+import hashlib
+import multiprocessing
+import time
+import uuid
+from contextlib import closing
 
-st.set_page_config(layout="wide", page_title="DIALER PRODUCTIVITY PER CRITERIA OF BALANCE", page_icon="📊", initial_sidebar_state="expanded")
+from engine import TREND_WINDOWS, build_summaries, build_trends, cube_options, filter_cube
+from export import SHEET_NAMES, render_sheet, workbook_bytes, export_frame
+from jobs import ALL_REPORTS, acquire_job, release_job, clear_jobs
+from profiling import PROFILE_ENABLED, PROFILE_MEMORY, PROFILE_LOG_PATH, collect_profile, stage, append_profile_log
+from store import content_digest, connect_store, clear_store
 
-# Apply dark mode and custom header styling
-st.markdown(
-    """
-    <style>
-    .reportview-container {
-        background: #2E2E2E;
-        color: white;
-    }
-    .sidebar .sidebar-content {
-        background: #2E2E2E;
-    }
-    h1, h2, h3 {
-        color: #87CEEB !important;  /* Light blue color */
-        font-weight: bold !important;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
+# Content hash of a table, used to memoize its export across reruns
+def table_fingerprint(df):
+    hashed = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha256(hashed.tobytes() + repr(df.columns.tolist()).encode()).hexdigest()
 
-st.title('SPM DIALING MONITORING ALL ENVI')
+# Rendered sheets are shared read-only between the single-sheet and all-categories workbooks.
+# Every filter combination adds its own five tables, so the limits leave room for a few of them.
+@st.cache_resource(max_entries=32, show_spinner=False)
+def cached_sheet(fingerprint, _df):
+    return render_sheet(_df)
 
-@st.cache_data
-def load_data(uploaded_file):
-    df = pd.read_excel(uploaded_file)
-    return df
+@st.cache_data(max_entries=40, show_spinner=False)
+def cached_workbook(fingerprints, sheet_names, _dfs):
+    return workbook_bytes(
+        [cached_sheet(fingerprint, df) for fingerprint, df in zip(fingerprints, _dfs)], sheet_names
+    )
 
 # Function to convert single DataFrame to Excel bytes with formatting
 def to_excel_single(df, sheet_name):
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df_copy = df.copy()
-        if 'Date' in df_copy.columns:
-            if pd.api.types.is_datetime64_any_dtype(df_copy['Date']):
-                df_copy['Date'] = df_copy['Date'].dt.strftime('%d-%m-%Y')
-            elif pd.api.types.is_object_dtype(df_copy['Date']):
-                df_copy['Date'] = pd.to_datetime(df_copy['Date'], errors='coerce').dt.strftime('%d-%m-%Y')
-        df_copy.to_excel(writer, index=False, sheet_name=sheet_name)
-        
-        workbook = writer.book
-        worksheet = writer.sheets[sheet_name]
-        
-        header_format = workbook.add_format({
-            'bold': True,
-            'bg_color': '#87CEEB',
-            'border': 1,
-            'align': 'center',
-            'valign': 'vcenter'
-        })
-        cell_format = workbook.add_format({'border': 1})
-        
-        for col_num, value in enumerate(df_copy.columns.values):
-            worksheet.write(0, col_num, value, header_format)
-        
-        for row_num in range(1, len(df_copy) + 1):
-            for col_num in range(len(df_copy.columns)):
-                worksheet.write(row_num, col_num, df_copy.iloc[row_num-1, col_num], cell_format)
-        
-        for i, col in enumerate(df_copy.columns):
-            max_length = max(
-                df_copy[col].astype(str).map(len).max(),
-                len(str(col))
-            )
-            worksheet.set_column(i, i, max_length + 2)
-    
-    return output.getvalue()
+    with stage(f'export {sheet_name}') as info:
+        info['rows'] = len(df)
+        return cached_workbook((table_fingerprint(df),), (sheet_name,), [df])
 
 # Function to combine all DataFrames into one Excel file
 def to_excel_all(dfs, sheet_names):
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        for df, sheet_name in zip(dfs, sheet_names):
-            df_copy = df.copy()
-            if 'Date' in df_copy.columns:
-                if pd.api.types.is_datetime64_any_dtype(df_copy['Date']):
-                    df_copy['Date'] = df_copy['Date'].dt.strftime('%d-%m-%Y')
-                elif pd.api.types.is_object_dtype(df_copy['Date']):
-                    df_copy['Date'] = pd.to_datetime(df_copy['Date'], errors='coerce').dt.strftime('%d-%m-%Y')
-            df_copy.to_excel(writer, index=False, sheet_name=sheet_name)
-            
-            workbook = writer.book
-            worksheet = writer.sheets[sheet_name]
-            
-            header_format = workbook.add_format({
-                'bold': True,
-                'bg_color': '#87CEEB',
-                'border': 1,
-                'align': 'center',
-                'valign': 'vcenter'
-            })
-            cell_format = workbook.add_format({'border': 1})
-            
-            for col_num, value in enumerate(df_copy.columns.values):
-                worksheet.write(0, col_num, value, header_format)
-            
-            for row_num in range(1, len(df_copy) + 1):
-                for col_num in range(len(df_copy.columns)):
-                    worksheet.write(row_num, col_num, df_copy.iloc[row_num-1, col_num], cell_format)
-            
-            for i, col in enumerate(df_copy.columns):
-                max_length = max(
-                    df_copy[col].astype(str).map(len).max(),
-                    len(str(col))
-                )
-                worksheet.set_column(i, i, max_length + 2)
-    
-    return output.getvalue()
+    with stage('export all categories') as info:
+        info['rows'] = sum(len(df) for df in dfs)
+        return cached_workbook(tuple(table_fingerprint(df) for df in dfs), tuple(sheet_names), dfs)
 
-with st.sidebar:
-    st.subheader("Upload File")
-    uploaded_file = st.file_uploader("Choose an Excel file", type=['xlsx'])
+# How often the page checks on a running report job
+JOB_POLL_SECONDS = 0.5
 
-if uploaded_file is not None:
-    df = load_data(uploaded_file)
-    
-    # Convert date column with error handling (using column name 'Date')
-    df['Date'] = pd.to_datetime(df['Date'], format='%d-%m-%Y', errors='coerce')
-    
-    # Check for invalid dates and warn user
-    if df['Date'].isna().any():
-        st.warning("Some dates could not be parsed. Check these rows:")
-        st.write(df[df['Date'].isna()])
+# Summary tables are paged on the server: search, sort and slicing run on the cached summary and
+# only the visible page goes to the browser, formatted through column_config rather than a Styler.
+PAGE_SIZES = [100, 500, 1000]
+
+# Unformatted number columns are shown with thousands separators; averages are shown without
+COUNT_COLUMN = st.column_config.NumberColumn()
+AVERAGE_COLUMN = st.column_config.NumberColumn(format="%d")
+DATE_COLUMN = st.column_config.DateColumn(format="DD-MM-YYYY")
+
+# Lower-cased text of each row as displayed (dates as dd-mm-YYYY), searched with a plain substring match
+@st.cache_resource(max_entries=32, show_spinner=False)
+def search_text(fingerprint, _df):
+    text = export_frame(_df).astype(str)
+    return text.iloc[:, 0].str.cat(text.iloc[:, 1:], sep='\n').str.lower().reset_index(drop=True)
+
+# Row positions in sorted order (stable, missing values last); the table's own order when column is None.
+# HH:MM:SS columns sort as durations, since hours can run past two digits, and date ranges by their
+# first date ("Invalid date range" last).
+@st.cache_resource(max_entries=32, show_spinner=False)
+def sort_order(fingerprint, _df, column, descending):
+    if column is None:
+        return np.arange(len(_df))
+    values = _df[column].reset_index(drop=True)
+    if 'TALK' in column:
+        values = pd.to_timedelta(values, errors='coerce')
+    elif column == 'DATE RANGE':
+        values = pd.to_datetime(values.str.split(' - ').str[0], format='%B %d, %Y', errors='coerce')
+    return values.sort_values(ascending=not descending, kind='stable', na_position='last').index.to_numpy()
+
+# Show one page of a summary table with search, sort and paging controls keyed by key
+def paged_table(df, key, column_config, height=500):
+    fingerprint = table_fingerprint(df)
+    search_column, sort_column, order_column, size_column, page_column = st.columns([3, 2, 1, 1, 1])
+    query = search_column.text_input("Search", key=f"{key}-search", placeholder="Search all columns")
+    sort_by = sort_column.selectbox(
+        "Sort by", [None] + df.columns.tolist(), key=f"{key}-sort",
+        format_func=lambda column: "Report order" if column is None else column
+    )
+    descending = order_column.toggle("Descending", key=f"{key}-descending", disabled=sort_by is None)
+    page_size = size_column.selectbox("Rows per page", PAGE_SIZES, key=f"{key}-page-size")
     
-    # Define roles to exclude
-    exclude_roles = [
-        "Supervisor",
-        "Superuser",
-        "Dialer specialist",
-        "Supervisor (without Predictive Dialer Monitor)"
-    ]
+    positions = sort_order(fingerprint, df, sort_by, descending)
+    if query.strip():
+        matches = search_text(fingerprint, df).str.contains(query.strip().lower(), regex=False).to_numpy()
+        positions = positions[matches[positions]]
     
-    # Filter out rows with excluded roles and zero talk time
-    df_filtered = df[~df["Role"].isin(exclude_roles)]
-    df_filtered = df_filtered[df_filtered["Talk Time Duration"] != "00:00:00"]
+    pages = max(-(-len(positions) // page_size), 1)
+    if st.session_state.get(f"{key}-page", 1) > pages:
+        st.session_state[f"{key}-page"] = pages
+    page = page_column.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}-page")
+    start = (page - 1) * page_size
+    visible = positions[start:start + page_size]
     
-    # Check if df_filtered is empty
-    if df_filtered.empty:
-        st.error("No data remains after filtering. Check your 'Role' and 'Talk Time Duration' columns.")
-    else:
-        # 1. Per Client and Date Summary
-        st.subheader("Summary Report Per Client and Date")
-        summary_table = pd.DataFrame(columns=[
-            'Date', 'CLIENT', 'ENVIRONMENT', 'COLLECTOR', 'TOTAL CONNECTED', 'TOTAL ACCOUNT', 'TOTAL TALK TIME',
-            'AVG CONNECTED', 'AVG ACCOUNT', 'AVG TALKTIME'
-        ])
-        
-        grouped = df_filtered.groupby([df_filtered['Date'].dt.date, df_filtered['Client']])
-        summary_data = []
-        for (date, client), group in grouped:
-            environment = ', '.join(group['ENVIRONMENT'].unique())
-            unique_collectors = group['Collector'].nunique()
-            total_connected = group.shape[0]
-            total_accounts = group['Account'].nunique()
-            talk_times = pd.to_timedelta(group['Talk Time Duration'].astype(str))
-            total_talk_time = talk_times.sum()
-            
-            total_seconds = int(total_talk_time.total_seconds())
-            hours = total_seconds // 3600
-            minutes = (total_seconds % 3600) // 60
-            seconds = total_seconds % 60
-            total_talk_time_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-            
-            avg_connected = math.ceil(total_connected / unique_collectors) if (total_connected / unique_collectors) % 1 >= 0.5 else round(total_connected / unique_collectors)
-            avg_account = math.ceil(total_accounts / unique_collectors) if (total_accounts / unique_collectors) % 1 >= 0.5 else round(total_accounts / unique_collectors)
-            avg_talktime_seconds = total_seconds / unique_collectors
-            avg_t_hours = int(avg_talktime_seconds // 3600)
-            avg_t_minutes = int((avg_talktime_seconds % 3600) // 60)
-            avg_t_seconds = int(avg_talktime_seconds % 60)
-            avg_talktime_str = f"{avg_t_hours:02d}:{avg_t_minutes:02d}:{avg_t_seconds:02d}"
-            
-            summary_data.append({
-                'Date': date,
-                'CLIENT': client,
-                'ENVIRONMENT': environment,
-                'COLLECTOR': unique_collectors,
-                'TOTAL CONNECTED': total_connected,
-                'TOTAL ACCOUNT': total_accounts,
-                'TOTAL TALK TIME': total_talk_time_str,
-                'AVG CONNECTED': avg_connected,
-                'AVG ACCOUNT': avg_account,
-                'AVG TALKTIME': avg_talktime_str
-            })
-        
-        summary_table = pd.DataFrame(summary_data)
-        st.dataframe(
-            summary_table.style.format({
-                'Date': '{:%d-%m-%Y}',
-                'COLLECTOR': '{:,.0f}',
-                'TOTAL CONNECTED': '{:,.0f}',
-                'TOTAL ACCOUNT': '{:,.0f}',
-                'AVG CONNECTED': '{:.0f}',
-                'AVG ACCOUNT': '{:.0f}'
-            }),
-            height=500,
-            use_container_width=True
-        )
-        
-        st.download_button(
-            label="Download Per Client and Date Summary as XLSX",
-            data=to_excel_single(summary_table, "Client_Date_Summary"),
-            file_name="dialer_client_date_summary_report.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            key="download-client-date"
-        )
-        
-        # 2. Summary Per Day
-        st.subheader("Summary Report Per Day")
-        daily_summary_table = pd.DataFrame(columns=[
-            'Date', 'CLIENT', 'ENVIRONMENT', 'COLLECTOR', 'TOTAL CONNECTED', 'TOTAL ACCOUNT', 'TOTAL TALK TIME',
-            'AVG CONNECTED', 'AVG ACCOUNT', 'AVG TALKTIME'
-        ])
-        
-        daily_grouped = df_filtered.groupby(df_filtered['Date'].dt.date)
-        daily_summary_data = []
-        for date, group in daily_grouped:
-            clients = ', '.join(group['Client'].unique())  # List all unique clients
-            environment = ', '.join(group['ENVIRONMENT'].unique())
-            unique_collectors = group['Collector'].nunique()
-            total_connected = group.shape[0]
-            total_accounts = group['Account'].nunique()
-            talk_times = pd.to_timedelta(group['Talk Time Duration'].astype(str))
-            total_talk_time = talk_times.sum()
-            
-            total_seconds = int(total_talk_time.total_seconds())
-            hours = total_seconds // 3600
-            minutes = (total_seconds % 3600) // 60
-            seconds = total_seconds % 60
-            total_talk_time_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-            
-            avg_connected = math.ceil(total_connected / unique_collectors) if (total_connected / unique_collectors) % 1 >= 0.5 else round(total_connected / unique_collectors)
-            avg_account = math.ceil(total_accounts / unique_collectors) if (total_accounts / unique_collectors) % 1 >= 0.5 else round(total_accounts / unique_collectors)
-            avg_talktime_seconds = total_seconds / unique_collectors
-            avg_t_hours = int(avg_talktime_seconds // 3600)
-            avg_t_minutes = int((avg_talktime_seconds % 3600) // 60)
-            avg_t_seconds = int(avg_talktime_seconds % 60)
-            avg_talktime_str = f"{avg_t_hours:02d}:{avg_t_minutes:02d}:{avg_t_seconds:02d}"
-            
-            daily_summary_data.append({
-                'Date': date,
-                'CLIENT': clients,
-                'ENVIRONMENT': environment,
-                'COLLECTOR': unique_collectors,
-                'TOTAL CONNECTED': total_connected,
-                'TOTAL ACCOUNT': total_accounts,
-                'TOTAL TALK TIME': total_talk_time_str,
-                'AVG CONNECTED': avg_connected,
-                'AVG ACCOUNT': avg_account,
-                'AVG TALKTIME': avg_talktime_str
-            })
-        
-        daily_summary_table = pd.DataFrame(daily_summary_data)
-        st.dataframe(
-            daily_summary_table.style.format({
-                'Date': '{:%d-%m-%Y}',
-                'COLLECTOR': '{:,.0f}',
-                'TOTAL CONNECTED': '{:,.0f}',
-                'TOTAL ACCOUNT': '{:,.0f}',
-                'AVG CONNECTED': '{:.0f}',
-                'AVG ACCOUNT': '{:.0f}'
-            }),
-            height=500,
-            use_container_width=True
-        )
-        
-        st.download_button(
-            label="Download Per Day Summary as XLSX",
-            data=to_excel_single(daily_summary_table, "Daily_Summary"),
-            file_name="dialer_daily_summary_report.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            key="download-daily"
+    st.dataframe(
+        df.iloc[visible],
+        column_config=column_config,
+        height=height,
+        hide_index=True,
+        use_container_width=True
+    )
+    shown = f"Rows {start + 1:,}–{start + len(visible):,} of {len(positions):,}" if len(visible) else "No matching rows"
+    st.caption(shown if len(positions) == len(df) else f"{shown} (filtered from {len(df):,})")
+
+# Content digests of the uploads, memoized per upload so reruns don't rehash the files
+def upload_digests(uploaded_files):
+    known = st.session_state.setdefault('upload_digests', {})
+    for f in uploaded_files:
+        if f.file_id not in known:
+            known[f.file_id] = content_digest(f.getvalue())
+    current = {f.file_id for f in uploaded_files}
+    for file_id in list(known):
+        if file_id not in current:
+            del known[file_id]
+    return tuple(known[f.file_id] for f in uploaded_files)
+
+# The background job building the reports for the current uploads. A session waits on one job at a
+# time: uploading something else (or changing the history setting) releases the old job, which is
+# cancelled unless another session is still waiting for it.
+def session_job(uploaded_files, include_history, profile, trace_memory):
+    key = (upload_digests(uploaded_files), include_history)
+    holder = st.session_state.setdefault('job_holder', uuid.uuid4().hex)
+    job = st.session_state.get('job')
+    if job is not None and job.key == key and not job.cancelled:
+        return job
+    if job is not None:
+        release_job(job, holder)
+    job = acquire_job(
+        key, [(f.name, f.getvalue()) for f in uploaded_files], include_history, holder, profile, trace_memory
+    )
+    st.session_state['job'] = job
+    return job
+
+# Sidebar drill-down filters over the cube's dates, clients, environments and collectors.
+# Returns filter_cube keyword arguments, empty when nothing is narrowed down.
+def cube_filters(cube):
+    filters = {}
+    dates = cube['Date'].dropna()
+    if not dates.empty:
+        first, last = dates.min().date(), dates.max().date()
+        picked = st.date_input(
+            "Date range", value=(first, last), min_value=first, max_value=last, format="DD-MM-YYYY", key="filter-dates"
         )
-        
-        # 3. Overall Summary with Header
-        st.header("Overall Summary Report")
-        overall_summary = pd.DataFrame(columns=[
-            'DATE RANGE', 'TOTAL COLLECTORS', 'TOTAL CONNECTED', 'TOTAL ACCOUNTS', 'TOTAL TALK TIME',
-            'AVG AGENTS/DAY', 'AVG CALLS/DAY', 'AVG CONNECTED/DAY', 'AVG ACCOUNTS/DAY', 'AVG TALKTIME/DAY'
-        ])
-        
-        min_date = df_filtered['Date'].min()
-        max_date = df_filtered['Date'].max()
-        if pd.isna(min_date) or pd.isna(max_date):
-            date_range = "Invalid date range (check Date column)"
-        else:
-            min_date_str = min_date.strftime('%B %d, %Y')
-            max_date_str = max_date.strftime('%B %d, %Y')
-            date_range = f"{min_date_str} - {max_date_str}"
+        if len(picked) == 2 and tuple(picked) != (first, last):
+            filters['dates'] = tuple(picked)
+    for name, column, label in [
+        ('clients', 'Client', "Client"), ('environments', 'ENVIRONMENT', "Environment"), ('collectors', 'Collector', "Collector")
+    ]:
+        selected = st.multiselect(label, cube_options(cube, column), placeholder="All", key=f"filter-{name}")
+        if selected:
+            filters[name] = selected
+    return filters
 
-        # Calculate totals from filtered data
-        total_collectors = df_filtered['Collector'].nunique()
-        total_connected = df_filtered.shape[0]
-        total_accounts = df_filtered['Account'].nunique()
-        total_talk_time = pd.to_timedelta(df_filtered['Talk Time Duration'].astype(str)).sum()
+# Summaries of the filtered cube, recomputed only when the exports or the filters change
+def filtered_summaries(digests, cube, filters):
+    cached = st.session_state.get('filtered_summaries')
+    if cached is None or cached[0] != (digests, filters):
+        subset = filter_cube(cube, **filters)
+        st.session_state['filtered_summaries'] = ((digests, filters), None if subset.empty else build_summaries(subset))
+    return st.session_state['filtered_summaries'][1]
 
-        total_seconds = int(total_talk_time.total_seconds())
-        hours = total_seconds // 3600
-        minutes = (total_seconds % 3600) // 60
-        seconds = total_seconds % 60
-        total_talk_time_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+# Trends of the filtered cube, recomputed only when the exports or the filters change
+def filtered_trends(digests, cube, filters):
+    cached = st.session_state.get('filtered_trends')
+    if cached is None or cached[0] != (digests, filters):
+        st.session_state['filtered_trends'] = ((digests, filters), build_trends(filter_cube(cube, **filters)))
+    return st.session_state['filtered_trends'][1]
 
-        # Use averages from daily_summary_table
-        avg_agents_per_day = math.ceil(daily_summary_table['COLLECTOR'].mean()) if daily_summary_table['COLLECTOR'].mean() % 1 >= 0.5 else round(daily_summary_table['COLLECTOR'].mean())
-        avg_calls_per_day = math.ceil(daily_summary_table['TOTAL CONNECTED'].mean()) if daily_summary_table['TOTAL CONNECTED'].mean() % 1 >= 0.5 else round(daily_summary_table['TOTAL CONNECTED'].mean())
-        avg_connected_per_day = math.ceil(daily_summary_table['AVG CONNECTED'].mean()) if daily_summary_table['AVG CONNECTED'].mean() % 1 >= 0.5 else round(daily_summary_table['AVG CONNECTED'].mean())
-        avg_accounts_per_day = math.ceil(daily_summary_table['TOTAL ACCOUNT'].mean()) if daily_summary_table['TOTAL ACCOUNT'].mean() % 1 >= 0.5 else round(daily_summary_table['TOTAL ACCOUNT'].mean())
+# Trend chart choices: the metric, and which of its daily, rolling or cumulative columns to plot
+TREND_MEASURES = {"Connected calls": 'Calls', "Accounts": 'Accounts', "Talk time (hours)": 'Seconds'}
+TREND_VIEWS = {
+    "Daily": '',
+    **{f"{window}-day average": f' {window}-day avg' for window in TREND_WINDOWS},
+    "Cumulative": ' to date'
+}
 
-        def str_to_timedelta(time_str):
-            h, m, s = map(int, time_str.split(':'))
-            return pd.Timedelta(hours=h, minutes=m, seconds=s)
+# Line chart of one trend column with a line per series (client or collector). Clicking the legend
+# highlights a line and the date axis pans and zooms; only the plotted columns go to the browser.
+def trend_chart(trends, column, series, title):
+    values = trends[column] / 3600 if column.startswith('Seconds') else trends[column]
+    data = pd.DataFrame({'Date': trends['Date'], series: trends[series], 'Value': values})
+    highlight = alt.selection_point(fields=[series], bind='legend')
+    return alt.Chart(data).mark_line().encode(
+        x=alt.X('Date:T', title=None, axis=alt.Axis(format='%d-%m-%Y')),
+        y=alt.Y('Value:Q', title=title),
+        color=alt.Color(f'{series}:N'),
+        opacity=alt.condition(highlight, alt.value(1), alt.value(0.15)),
+        tooltip=[
+            alt.Tooltip('Date:T', format='%d-%m-%Y'),
+            alt.Tooltip(f'{series}:N'),
+            alt.Tooltip('Value:Q', title=title, format=',.1f')
+        ]
+    ).add_params(highlight).interactive(bind_y=False)
 
-        avg_talktimes = daily_summary_table['AVG TALKTIME'].apply(str_to_timedelta)
-        avg_talktime_per_day = avg_talktimes.mean()
-        avg_t_seconds = int(avg_talktime_per_day.total_seconds())
-        avg_hours = avg_t_seconds // 3600
-        avg_minutes = (avg_t_seconds % 3600) // 60
-        avg_seconds = avg_t_seconds % 60
-        avg_talktime_str = f"{avg_hours:02d}:{avg_minutes:02d}:{avg_seconds:02d}"
+# The page itself. Streamlit runs this script as __main__; parse workers import it again as
+# __mp_main__ (see below) and must not render anything.
+def main():
+    st.set_page_config(layout="wide", page_title="DIALER PRODUCTIVITY PER CRITERIA OF BALANCE", page_icon="📊", initial_sidebar_state="expanded")
 
-        overall_summary = pd.DataFrame([{
-            'DATE RANGE': date_range,
-            'TOTAL COLLECTORS': total_collectors,
-            'TOTAL CONNECTED': total_connected,
-            'TOTAL ACCOUNTS': total_accounts,
-            'TOTAL TALK TIME': total_talk_time_str,
-            'AVG AGENTS/DAY': avg_agents_per_day,
-            'AVG CALLS/DAY': avg_calls_per_day,
-            'AVG CONNECTED/DAY': avg_connected_per_day,
-            'AVG ACCOUNTS/DAY': avg_accounts_per_day,
-            'AVG TALKTIME/DAY': avg_talktime_str
-        }])
+    # Apply dark mode and custom header styling
+    st.markdown(
+        """
+        <style>
+        .reportview-container {
+            background: #2E2E2E;
+            color: white;
+        }
+        .sidebar .sidebar-content {
+            background: #2E2E2E;
+        }
+        h1, h2, h3 {
+            color: #87CEEB !important;  /* Light blue color */
+            font-weight: bold !important;
+        }
+        </style>
+        """,
+        unsafe_allow_html=True
+    )
 
-        st.dataframe(
-            overall_summary.style.format({
-                'TOTAL COLLECTORS': '{:,.0f}',
-                'TOTAL CONNECTED': '{:,.0f}',
-                'TOTAL ACCOUNTS': '{:,.0f}',
-                'AVG AGENTS/DAY': '{:.0f}',
-                'AVG CALLS/DAY': '{:.0f}',
-                'AVG CONNECTED/DAY': '{:.0f}',
-                'AVG ACCOUNTS/DAY': '{:.0f}'
-            }),
-            use_container_width=True
+    st.title('SPM DIALING MONITORING ALL ENVI')
+    
+    with st.sidebar:
+        st.subheader("Upload Files")
+        uploaded_files = st.file_uploader("Choose Excel files", type=['xlsx'], accept_multiple_files=True)
+        include_history = st.checkbox(
+            "Include previously uploaded days",
+            help="Report on every export already in the local aggregate store, not just the files above."
         )
-        
-        st.download_button(
-            label="Download Overall Summary as XLSX",
-            data=to_excel_single(overall_summary, "Overall_Summary"),
-            file_name="dialer_overall_summary_report.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            key="download-overall"
+        if st.button("Clear stored days"):
+            with closing(connect_store()) as conn:
+                clear_store(conn)
+            clear_jobs()
+            st.session_state.pop('job', None)
+        profile_run = st.toggle(
+            "Profile this run", value=PROFILE_ENABLED,
+            help="Time each pipeline stage, show the results below and append them to the profiling log."
         )
+        trace_memory = st.checkbox(
+            "Trace memory peaks", value=PROFILE_MEMORY, disabled=not profile_run,
+            help="Also record each stage's allocation peak. Tracing makes the timings several times slower."
+        )
+
+    # Stage timings are collected for the whole run; the profile is closed even when Streamlit stops the
+    # script midway (a widget change or the polling rerun), so memory tracing never outlives it
+    run_started = time.perf_counter()
+    with collect_profile(profile_run, trace_memory) as profile_records:
+        if uploaded_files:
+            job = session_job(uploaded_files, include_history, profile_run, trace_memory)
+            results = job.snapshot()
+            if not job.done:
+                st.progress(job.progress, text=job.status)
+            elif job.error is not None:
+                st.error("Processing the uploads failed.")
+                st.exception(job.error)
+        
+            tables = results.get('tables', ())
+            filters = {}
+            if 'cube' in results:
+                with st.sidebar:
+                    st.subheader("Filters")
+                    filters = cube_filters(results['cube'])
+            if filters:
+                with stage('filtered summaries') as info:
+                    tables = filtered_summaries(results['digests'], results['cube'], filters)
+                    info['rows'] = len(tables[0]) if tables is not None else 0
+        
+            with st.sidebar:
+                for file_name, before, after in results.get('memory_report', []):
+                    st.caption(f"{file_name}: {before / 1e6:.1f} MB → {after / 1e6:.1f} MB in memory after normalization")
         
-        # 4. Overall Per Client Summary
-        st.subheader("Overall Per Client Summary")
-        client_summary = pd.DataFrame(columns=[
-            'CLIENT', 'DATE RANGE', 'ENVIRONMENT', 'COLLECTOR', 'TOTAL CONNECTED', 'TOTAL ACCOUNT', 'TOTAL TALK TIME',
-            'AVG AGENTS/DAY', 'AVG CALLS/DAY', 'AVG ACCOUNTS/DAY', 'AVG TALKTIME/DAY'
-        ])
+            # Check for invalid dates and warn user (only the first few rows are loaded and shown)
+            invalid_count = results.get('invalid_count', 0)
+            if invalid_count:
+                invalid_rows = results['invalid_rows']
+                if invalid_count > len(invalid_rows):
+                    st.warning(f"{invalid_count:,} dates could not be parsed. Check these rows (first {len(invalid_rows):,} shown):")
+                else:
+                    st.warning("Some dates could not be parsed. Check these rows:")
+                st.dataframe(invalid_rows, column_config={'Row': AVERAGE_COLUMN}, hide_index=True, use_container_width=True)
         
-        grouped_clients = df_filtered.groupby(df_filtered['Client'])
-        client_summary_data = []
-        for client, group in grouped_clients:
-            client_min_date = group['Date'].min()
-            client_max_date = group['Date'].max()
-            if pd.isna(client_min_date) or pd.isna(client_max_date):
-                client_date_range = "Invalid date range"
-            else:
-                client_min_date_str = client_min_date.strftime('%B %d, %Y')
-                client_max_date_str = client_max_date.strftime('%B %d, %Y')
-                client_date_range = f"{client_min_date_str} - {client_max_date_str}"
+            # Workbooks for download: the job writes the unfiltered ones, filtered views are exported here.
+            # A button stays disabled until its workbook is ready.
+            workbooks = results.get('workbooks', {})
+            def download(label, table_index, sheet_name, file_name, key):
+                if filters:
+                    data = to_excel_single(tables[table_index], sheet_name)
+                else:
+                    data = workbooks.get(sheet_name)
+                st.download_button(
+                    label=label,
+                    data=data if data is not None else b"",
+                    file_name=file_name,
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    key=key,
+                    disabled=data is None
+                )
+        
+            def pending(table_index):
+                if len(tables) > table_index:
+                    return False
+                if not job.done:
+                    st.caption("Still being built...")
+                return True
+        
+            # Check if anything remains after filtering
+            if tables is None and filters:
+                st.error("No data matches the selected filters.")
+            elif tables is None:
+                st.error("No data remains after filtering. Check your 'Role' and 'Talk Time Duration' columns.")
+            elif 'tables' in results or filters:
+                # 1. Per Client and Date Summary
+                st.subheader("Summary Report Per Client and Date")
+                if not pending(0):
+                    with stage('render Client_Date_Summary'):
+                        paged_table(tables[0], "client-date", {
+                            'Date': DATE_COLUMN,
+                            'COLLECTOR': COUNT_COLUMN,
+                            'TOTAL CONNECTED': COUNT_COLUMN,
+                            'TOTAL ACCOUNT': COUNT_COLUMN,
+                            'AVG CONNECTED': AVERAGE_COLUMN,
+                            'AVG ACCOUNT': AVERAGE_COLUMN
+                        })
+                
+                    download(
+                        "Download Per Client and Date Summary as XLSX", 0, "Client_Date_Summary",
+                        "dialer_client_date_summary_report.xlsx", "download-client-date"
+                    )
             
-            environment = ', '.join(group['ENVIRONMENT'].unique())
-            unique_collectors = group['Collector'].nunique()
-            total_connected = group.shape[0]
-            total_accounts = group['Account'].nunique()
-            talk_times = pd.to_timedelta(group['Talk Time Duration'].astype(str))
-            total_talk_time = talk_times.sum()
+                # 2. Summary Per Day
+                st.subheader("Summary Report Per Day")
+                if not pending(1):
+                    with stage('render Daily_Summary'):
+                        paged_table(tables[1], "daily", {
+                            'Date': DATE_COLUMN,
+                            'COLLECTOR': COUNT_COLUMN,
+                            'TOTAL CONNECTED': COUNT_COLUMN,
+                            'TOTAL ACCOUNT': COUNT_COLUMN,
+                            'AVG CONNECTED': AVERAGE_COLUMN,
+                            'AVG ACCOUNT': AVERAGE_COLUMN
+                        })
+                
+                    download(
+                        "Download Per Day Summary as XLSX", 1, "Daily_Summary",
+                        "dialer_daily_summary_report.xlsx", "download-daily"
+                    )
             
-            total_seconds = int(total_talk_time.total_seconds())
-            hours = total_seconds // 3600
-            minutes = (total_seconds % 3600) // 60
-            seconds = total_seconds % 60
-            total_talk_time_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+                # 3. Overall Summary with Header
+                st.header("Overall Summary Report")
+                if not pending(2):
+                    with stage('render Overall_Summary'):
+                        st.dataframe(
+                            tables[2],
+                            column_config={
+                                'TOTAL COLLECTORS': COUNT_COLUMN,
+                                'TOTAL CONNECTED': COUNT_COLUMN,
+                                'TOTAL ACCOUNTS': COUNT_COLUMN,
+                                'AVG AGENTS/DAY': AVERAGE_COLUMN,
+                                'AVG CALLS/DAY': AVERAGE_COLUMN,
+                                'AVG CONNECTED/DAY': AVERAGE_COLUMN,
+                                'AVG ACCOUNTS/DAY': AVERAGE_COLUMN
+                            },
+                            hide_index=True,
+                            use_container_width=True
+                        )
+                
+                    download(
+                        "Download Overall Summary as XLSX", 2, "Overall_Summary",
+                        "dialer_overall_summary_report.xlsx", "download-overall"
+                    )
             
-            client_summary_subset = summary_table[summary_table['CLIENT'] == client]
-            avg_agents_per_day = math.ceil(client_summary_subset['COLLECTOR'].mean()) if client_summary_subset['COLLECTOR'].mean() % 1 >= 0.5 else round(client_summary_subset['COLLECTOR'].mean())
-            avg_calls_per_day = math.ceil(client_summary_subset['TOTAL CONNECTED'].mean()) if client_summary_subset['TOTAL CONNECTED'].mean() % 1 >= 0.5 else round(client_summary_subset['TOTAL CONNECTED'].mean())
-            avg_accounts_per_day = math.ceil(client_summary_subset['TOTAL ACCOUNT'].mean()) if client_summary_subset['TOTAL ACCOUNT'].mean() % 1 >= 0.5 else round(client_summary_subset['TOTAL ACCOUNT'].mean())
+                # 4. Overall Per Client Summary
+                st.subheader("Overall Per Client Summary")
+                if not pending(3):
+                    with stage('render Client_Summary'):
+                        paged_table(tables[3], "client", {
+                            'COLLECTOR': COUNT_COLUMN,
+                            'TOTAL CONNECTED': COUNT_COLUMN,
+                            'TOTAL ACCOUNT': COUNT_COLUMN,
+                            'AVG AGENTS/DAY': AVERAGE_COLUMN,
+                            'AVG CALLS/DAY': AVERAGE_COLUMN,
+                            'AVG ACCOUNTS/DAY': AVERAGE_COLUMN
+                        })
+                
+                    download(
+                        "Download Overall Per Client Summary as XLSX", 3, "Client_Summary",
+                        "dialer_overall_client_summary_report.xlsx", "download-client-overall"
+                    )
             
-            client_avg_talktimes = client_summary_subset['AVG TALKTIME'].apply(str_to_timedelta)
-            avg_talktime_per_day = client_avg_talktimes.mean()
-            if pd.isna(avg_talktime_per_day):
-                avg_talktime_str = "00:00:00"
-            else:
-                avg_t_seconds = int(avg_talktime_per_day.total_seconds())
-                avg_hours = avg_t_seconds // 3600
-                avg_minutes = (avg_t_seconds % 3600) // 60
-                avg_seconds = avg_t_seconds % 60
-                avg_talktime_str = f"{avg_hours:02d}:{avg_minutes:02d}:{avg_seconds:02d}"
+                # 5. Collector Leaderboard
+                st.subheader("Collector Leaderboard Per Client and Date")
+                if not pending(4):
+                    with stage('render Collector_Summary'):
+                        paged_table(tables[4], "collector", {
+                            'Date': DATE_COLUMN,
+                            'RANK': AVERAGE_COLUMN,
+                            'TOTAL CONNECTED': COUNT_COLUMN,
+                            'TOTAL ACCOUNT': COUNT_COLUMN
+                        })
+                
+                    download(
+                        "Download Collector Leaderboard as XLSX", 4, "Collector_Summary",
+                        "dialer_collector_summary_report.xlsx", "download-collector"
+                    )
             
-            client_summary_data.append({
-                'CLIENT': client,
-                'DATE RANGE': client_date_range,
-                'ENVIRONMENT': environment,
-                'COLLECTOR': unique_collectors,
-                'TOTAL CONNECTED': total_connected,
-                'TOTAL ACCOUNT': total_accounts,
-                'TOTAL TALK TIME': total_talk_time_str,
-                'AVG AGENTS/DAY': avg_agents_per_day,
-                'AVG CALLS/DAY': avg_calls_per_day,
-                'AVG ACCOUNTS/DAY': avg_accounts_per_day,
-                'AVG TALKTIME/DAY': avg_talktime_str
-            })
-        
-        client_summary = pd.DataFrame(client_summary_data)
-        st.dataframe(
-            client_summary.style.format({
-                'COLLECTOR': '{:,.0f}',
-                'TOTAL CONNECTED': '{:,.0f}',
-                'TOTAL ACCOUNT': '{:,.0f}',
-                'AVG AGENTS/DAY': '{:.0f}',
-                'AVG CALLS/DAY': '{:.0f}',
-                'AVG ACCOUNTS/DAY': '{:.0f}'
-            }),
-            height=500,
-            use_container_width=True
-        )
-        
-        st.download_button(
-            label="Download Overall Per Client Summary as XLSX",
-            data=to_excel_single(client_summary, "Client_Summary"),
-            file_name="dialer_overall_client_summary_report.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            key="download-client-overall"
-        )
-        
-        # 5. Download All Categories Button
-        st.subheader("Download All Reports")
-        st.download_button(
-            label="Download All Categories as XLSX",
-            data=to_excel_all(
-                [summary_table, daily_summary_table, overall_summary, client_summary],
-                ["Client_Date_Summary", "Daily_Summary", "Overall_Summary", "Client_Summary"]
-            ),
-            file_name="dialer_all_categories_report.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            key="download-all"
-        )
+                # 6. Trends, per client or per collector of one client
+                st.subheader("Trends")
+                trends = filtered_trends(results['digests'], results['cube'], filters) if filters else results.get('trends')
+                if trends is None:
+                    if not job.done:
+                        st.caption("Still being built...")
+                else:
+                    client_trends, collector_trends = trends
+                    measure_column, view_column, client_column = st.columns(3)
+                    measure = measure_column.selectbox("Measure", list(TREND_MEASURES), key="trend-measure")
+                    view = view_column.selectbox("View", list(TREND_VIEWS), key="trend-view")
+                    client = client_column.selectbox(
+                        "Show", [None] + sorted(client_trends['Client'].unique()), key="trend-client",
+                        format_func=lambda client: "All clients" if client is None else f"Collectors of {client}"
+                    )
+                    column = TREND_MEASURES[measure] + TREND_VIEWS[view]
+                    with stage('render trends'):
+                        if client is None:
+                            chart = trend_chart(client_trends, column, 'Client', f"{measure}, {view.lower()}")
+                        else:
+                            collector_rows = collector_trends[collector_trends['Client'] == client]
+                            chart = trend_chart(collector_rows, column, 'Collector', f"{measure}, {view.lower()}")
+                        st.altair_chart(chart, use_container_width=True)
+            
+                # 7. Download All Categories Button
+                st.subheader("Download All Reports")
+                if filters:
+                    all_reports = to_excel_all(list(tables), list(SHEET_NAMES))
+                else:
+                    all_reports = workbooks.get(ALL_REPORTS)
+                st.download_button(
+                    label="Download All Categories as XLSX",
+                    data=all_reports if all_reports is not None else b"",
+                    file_name="dialer_all_categories_report.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    key="download-all",
+                    disabled=all_reports is None
+                )
+
+        else:
+            st.info("Please upload one or more Excel files using the sidebar to generate the report.")
+            job = None
+            if 'job' in st.session_state:
+                release_job(st.session_state.pop('job'), st.session_state['job_holder'])
+
+    # Show and log the stage timings of this run, together with the job's once it has finished
+    # (runs that only poll a running job aren't logged)
+    if profile_run:
+        run_seconds = time.perf_counter() - run_started
+        if job is None or job.done:
+            if job is not None and st.session_state.get('profiled_job') is not job:
+                st.session_state['profiled_job'] = job
+                profile_records = job.records + profile_records
+            append_profile_log(
+                profile_records,
+                total_seconds=round(run_seconds, 4),
+                trace_memory=trace_memory,
+                inputs=[f.name for f in uploaded_files or []],
+                input_bytes=sum(f.size for f in uploaded_files or [])
+            )
+            with st.expander("Performance profile", expanded=True):
+                st.caption(f"Run took {run_seconds:.2f}s. Appended to {PROFILE_LOG_PATH}")
+                st.dataframe(pd.DataFrame(profile_records), use_container_width=True)
+
+    # Add basic table styling
+    st.markdown(
+        """
+        <style>
+        thead tr th {
+            color: white !important;
+            background-color: #4A4A4A !important;
+        }
+        tbody tr:nth-child(odd) {
+            background-color: #3A3A3A;
+        }
+        </style>
+        """,
+        unsafe_allow_html=True
+    )
 
-else:
-    st.info("Please upload an Excel file using the sidebar to generate the report.")
+    # Poll the background job until it has finished
+    if job is not None and not job.done:
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
 
-# Add basic table styling
-st.markdown(
-    """
-    <style>
-    thead tr th {
-        color: white !important;
-        background-color: #4A4A4A !important;
-    }
-    tbody tr:nth-child(odd) {
-        background-color: #3A3A3A;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
+if __name__ == '__main__':
+    # Parse workers are started by a forkserver and each imports this script again as __mp_main__;
+    # the server imports the heavy libraries once up front so the workers don't import them over
+    # again. Only installed packages: the server doesn't get this script's directory on its path.
+    multiprocessing.set_forkserver_preload(
+        ['streamlit', 'altair', 'pandas', 'pyarrow', 'pyarrow.parquet', 'openpyxl', 'xlsxwriter']
+    )
+    main()
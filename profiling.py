@@ -0,0 +1,158 @@
+import contextvars
+import json
+import os
+import platform
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+from store import APP_DIR
+
+# Opt-in stage timings. A profile is a list of stage records held in a context variable, so each
+# Streamlit session (one script thread per run) or worker process only sees its own records, and
+# stage() is a no-op when no profile is active.
+PROFILE_ENABLED = os.environ.get('SPM_PROFILE', '') not in ('', '0')
+PROFILE_MEMORY = os.environ.get('SPM_PROFILE_MEMORY', '') not in ('', '0')
+PROFILE_LOG_PATH = os.environ.get('SPM_PROFILE_LOG', os.path.join(APP_DIR, 'profile_log.jsonl'))
+
+_profile = contextvars.ContextVar('spm_profile', default=None)
+
+# tracemalloc is process-wide while profiles are per session or job: tracing runs while any profile
+# traces memory (a count of them), and is only stopped if it was started here. Open traced stages of
+# every profile are kept together, since resetting the peak for one stage resets it for all.
+_tracing_lock = threading.Lock()
+_tracing_profiles = 0
+_started_tracing = False
+_traced_stages = []
+
+def acquire_tracing():
+    global _tracing_profiles, _started_tracing
+    with _tracing_lock:
+        if _tracing_profiles == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+        _tracing_profiles += 1
+
+def release_tracing():
+    global _tracing_profiles, _started_tracing
+    with _tracing_lock:
+        _tracing_profiles -= 1
+        if _tracing_profiles == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+# Start collecting stage records in the current context; returns the (live) list of records.
+# With trace_memory each stage also records its tracemalloc allocation peak. Tracing slows
+# allocation-heavy Python code several times over, so timings are only comparable between runs
+# with the same setting. Every start_profile needs its stop_profile (collect_profile pairs them).
+def start_profile(trace_memory=False):
+    if trace_memory:
+        acquire_tracing()
+    records = []
+    _profile.set({'records': records, 'open': [], 'trace_memory': trace_memory})
+    return records
+
+def stop_profile():
+    profile = _profile.get()
+    if profile is None:
+        return []
+    _profile.set(None)
+    if profile['trace_memory']:
+        release_tracing()
+    return profile['records']
+
+# Collect into a fresh profile for the duration of the block, then restore whatever was active before
+@contextmanager
+def collect_profile(enabled=True, trace_memory=False):
+    if not enabled:
+        yield []
+        return
+    outer = _profile.get()
+    records = start_profile(trace_memory)
+    try:
+        yield records
+    finally:
+        stop_profile()
+        _profile.set(outer)
+
+def is_profiling():
+    return _profile.get() is not None
+
+def is_tracing_memory():
+    profile = _profile.get()
+    return profile is not None and profile['trace_memory']
+
+# Remove an open stage entry by identity (entries of different stages can compare equal)
+def discard_stage(open_stages, entry):
+    for position, other in enumerate(open_stages):
+        if other is entry:
+            del open_stages[position]
+            return
+
+# Time one pipeline stage. The block may set info['rows']. When memory is traced, peak_mb is the
+# (Python and NumPy) allocation peak while the stage ran; stages may nest, outer stages include
+# their inner peaks. The peak is process-wide, so stages running alongside in other sessions or
+# jobs count towards it.
+@contextmanager
+def stage(name):
+    profile = _profile.get()
+    info = {}
+    if profile is None:
+        yield info
+        return
+    
+    trace_memory = profile['trace_memory']
+    open_stages = _traced_stages if trace_memory else profile['open']
+    entry = {'peak': 0}
+    if trace_memory:
+        with _tracing_lock:
+            current_peak = tracemalloc.get_traced_memory()[1]
+            for other in open_stages:
+                other['peak'] = max(other['peak'], current_peak)
+            tracemalloc.reset_peak()
+            open_stages.append(entry)
+    else:
+        open_stages.append(entry)
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        seconds = time.perf_counter() - start
+        peak_mb = None
+        if trace_memory:
+            with _tracing_lock:
+                discard_stage(open_stages, entry)
+                peak = max(entry['peak'], tracemalloc.get_traced_memory()[1])
+                for other in open_stages:
+                    other['peak'] = max(other['peak'], peak)
+            peak_mb = round(peak / 1e6, 1)
+        else:
+            discard_stage(open_stages, entry)
+        profile['records'].append({
+            'stage': name,
+            'seconds': round(seconds, 4),
+            'rows': info.get('rows'),
+            'peak_mb': peak_mb
+        })
+
+# Add records collected elsewhere (e.g. returned from a worker process) to the active profile
+def add_records(records):
+    profile = _profile.get()
+    if profile is not None:
+        profile['records'].extend(records)
+
+# Append one run to the JSON-lines log so timings can be compared across releases and input sizes
+def append_profile_log(records, log_path=None, **fields):
+    entry = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        **fields,
+        'stages': records
+    }
+    with open(log_path or PROFILE_LOG_PATH, 'a') as f:
+        f.write(json.dumps(entry, default=str) + '\n')
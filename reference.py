@@ -0,0 +1,275 @@
+import pandas as pd
+import math
+
+# The original per-group implementation of the four summaries, kept verbatim (only lifted out of
+# the Streamlit script) as the ground truth the benchmark checks the engine against. It is slow by
+# design; nothing in the app imports it.
+
+REFERENCE_EXCLUDE_ROLES = [
+    "Supervisor",
+    "Superuser",
+    "Dialer specialist",
+    "Supervisor (without Predictive Dialer Monitor)"
+]
+
+# Date conversion and filtering exactly as the original script did it on the pd.read_excel frame
+def reference_filter(df):
+    df = df.copy()
+    df['Date'] = pd.to_datetime(df['Date'], format='%d-%m-%Y', errors='coerce')
+    df_filtered = df[~df["Role"].isin(REFERENCE_EXCLUDE_ROLES)]
+    df_filtered = df_filtered[df_filtered["Talk Time Duration"] != "00:00:00"]
+    return df_filtered
+
+def str_to_timedelta(time_str):
+    h, m, s = map(int, time_str.split(':'))
+    return pd.Timedelta(hours=h, minutes=m, seconds=s)
+
+# Client/date, daily, overall and per-client summaries of the filtered rows
+def reference_summaries(df_filtered):
+    # 1. Per Client and Date Summary
+    summary_table = pd.DataFrame(columns=[
+        'Date', 'CLIENT', 'ENVIRONMENT', 'COLLECTOR', 'TOTAL CONNECTED', 'TOTAL ACCOUNT', 'TOTAL TALK TIME',
+        'AVG CONNECTED', 'AVG ACCOUNT', 'AVG TALKTIME'
+    ])
+    
+    grouped = df_filtered.groupby([df_filtered['Date'].dt.date, df_filtered['Client']])
+    summary_data = []
+    for (date, client), group in grouped:
+        environment = ', '.join(group['ENVIRONMENT'].unique())
+        unique_collectors = group['Collector'].nunique()
+        total_connected = group.shape[0]
+        total_accounts = group['Account'].nunique()
+        talk_times = pd.to_timedelta(group['Talk Time Duration'].astype(str))
+        total_talk_time = talk_times.sum()
+        
+        total_seconds = int(total_talk_time.total_seconds())
+        hours = total_seconds // 3600
+        minutes = (total_seconds % 3600) // 60
+        seconds = total_seconds % 60
+        total_talk_time_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+        
+        avg_connected = math.ceil(total_connected / unique_collectors) if (total_connected / unique_collectors) % 1 >= 0.5 else round(total_connected / unique_collectors)
+        avg_account = math.ceil(total_accounts / unique_collectors) if (total_accounts / unique_collectors) % 1 >= 0.5 else round(total_accounts / unique_collectors)
+        avg_talktime_seconds = total_seconds / unique_collectors
+        avg_t_hours = int(avg_talktime_seconds // 3600)
+        avg_t_minutes = int((avg_talktime_seconds % 3600) // 60)
+        avg_t_seconds = int(avg_talktime_seconds % 60)
+        avg_talktime_str = f"{avg_t_hours:02d}:{avg_t_minutes:02d}:{avg_t_seconds:02d}"
+        
+        summary_data.append({
+            'Date': date,
+            'CLIENT': client,
+            'ENVIRONMENT': environment,
+            'COLLECTOR': unique_collectors,
+            'TOTAL CONNECTED': total_connected,
+            'TOTAL ACCOUNT': total_accounts,
+            'TOTAL TALK TIME': total_talk_time_str,
+            'AVG CONNECTED': avg_connected,
+            'AVG ACCOUNT': avg_account,
+            'AVG TALKTIME': avg_talktime_str
+        })
+    
+    summary_table = pd.DataFrame(summary_data)
+    
+    # 2. Summary Per Day
+    daily_summary_table = pd.DataFrame(columns=[
+        'Date', 'CLIENT', 'ENVIRONMENT', 'COLLECTOR', 'TOTAL CONNECTED', 'TOTAL ACCOUNT', 'TOTAL TALK TIME',
+        'AVG CONNECTED', 'AVG ACCOUNT', 'AVG TALKTIME'
+    ])
+    
+    daily_grouped = df_filtered.groupby(df_filtered['Date'].dt.date)
+    daily_summary_data = []
+    for date, group in daily_grouped:
+        clients = ', '.join(group['Client'].unique())  # List all unique clients
+        environment = ', '.join(group['ENVIRONMENT'].unique())
+        unique_collectors = group['Collector'].nunique()
+        total_connected = group.shape[0]
+        total_accounts = group['Account'].nunique()
+        talk_times = pd.to_timedelta(group['Talk Time Duration'].astype(str))
+        total_talk_time = talk_times.sum()
+        
+        total_seconds = int(total_talk_time.total_seconds())
+        hours = total_seconds // 3600
+        minutes = (total_seconds % 3600) // 60
+        seconds = total_seconds % 60
+        total_talk_time_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+        
+        avg_connected = math.ceil(total_connected / unique_collectors) if (total_connected / unique_collectors) % 1 >= 0.5 else round(total_connected / unique_collectors)
+        avg_account = math.ceil(total_accounts / unique_collectors) if (total_accounts / unique_collectors) % 1 >= 0.5 else round(total_accounts / unique_collectors)
+        avg_talktime_seconds = total_seconds / unique_collectors
+        avg_t_hours = int(avg_talktime_seconds // 3600)
+        avg_t_minutes = int((avg_talktime_seconds % 3600) // 60)
+        avg_t_seconds = int(avg_talktime_seconds % 60)
+        avg_talktime_str = f"{avg_t_hours:02d}:{avg_t_minutes:02d}:{avg_t_seconds:02d}"
+        
+        daily_summary_data.append({
+            'Date': date,
+            'CLIENT': clients,
+            'ENVIRONMENT': environment,
+            'COLLECTOR': unique_collectors,
+            'TOTAL CONNECTED': total_connected,
+            'TOTAL ACCOUNT': total_accounts,
+            'TOTAL TALK TIME': total_talk_time_str,
+            'AVG CONNECTED': avg_connected,
+            'AVG ACCOUNT': avg_account,
+            'AVG TALKTIME': avg_talktime_str
+        })
+    
+    daily_summary_table = pd.DataFrame(daily_summary_data)
+    
+    # 3. Overall Summary with Header
+    overall_summary = pd.DataFrame(columns=[
+        'DATE RANGE', 'TOTAL COLLECTORS', 'TOTAL CONNECTED', 'TOTAL ACCOUNTS', 'TOTAL TALK TIME',
+        'AVG AGENTS/DAY', 'AVG CALLS/DAY', 'AVG CONNECTED/DAY', 'AVG ACCOUNTS/DAY', 'AVG TALKTIME/DAY'
+    ])
+    
+    min_date = df_filtered['Date'].min()
+    max_date = df_filtered['Date'].max()
+    if pd.isna(min_date) or pd.isna(max_date):
+        date_range = "Invalid date range (check Date column)"
+    else:
+        min_date_str = min_date.strftime('%B %d, %Y')
+        max_date_str = max_date.strftime('%B %d, %Y')
+        date_range = f"{min_date_str} - {max_date_str}"
+
+    # Calculate totals from filtered data
+    total_collectors = df_filtered['Collector'].nunique()
+    total_connected = df_filtered.shape[0]
+    total_accounts = df_filtered['Account'].nunique()
+    total_talk_time = pd.to_timedelta(df_filtered['Talk Time Duration'].astype(str)).sum()
+
+    total_seconds = int(total_talk_time.total_seconds())
+    hours = total_seconds // 3600
+    minutes = (total_seconds % 3600) // 60
+    seconds = total_seconds % 60
+    total_talk_time_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+    # Use averages from daily_summary_table
+    avg_agents_per_day = math.ceil(daily_summary_table['COLLECTOR'].mean()) if daily_summary_table['COLLECTOR'].mean() % 1 >= 0.5 else round(daily_summary_table['COLLECTOR'].mean())
+    avg_calls_per_day = math.ceil(daily_summary_table['TOTAL CONNECTED'].mean()) if daily_summary_table['TOTAL CONNECTED'].mean() % 1 >= 0.5 else round(daily_summary_table['TOTAL CONNECTED'].mean())
+    avg_connected_per_day = math.ceil(daily_summary_table['AVG CONNECTED'].mean()) if daily_summary_table['AVG CONNECTED'].mean() % 1 >= 0.5 else round(daily_summary_table['AVG CONNECTED'].mean())
+    avg_accounts_per_day = math.ceil(daily_summary_table['TOTAL ACCOUNT'].mean()) if daily_summary_table['TOTAL ACCOUNT'].mean() % 1 >= 0.5 else round(daily_summary_table['TOTAL ACCOUNT'].mean())
+
+    avg_talktimes = daily_summary_table['AVG TALKTIME'].apply(str_to_timedelta)
+    avg_talktime_per_day = avg_talktimes.mean()
+    avg_t_seconds = int(avg_talktime_per_day.total_seconds())
+    avg_hours = avg_t_seconds // 3600
+    avg_minutes = (avg_t_seconds % 3600) // 60
+    avg_seconds = avg_t_seconds % 60
+    avg_talktime_str = f"{avg_hours:02d}:{avg_minutes:02d}:{avg_seconds:02d}"
+
+    overall_summary = pd.DataFrame([{
+        'DATE RANGE': date_range,
+        'TOTAL COLLECTORS': total_collectors,
+        'TOTAL CONNECTED': total_connected,
+        'TOTAL ACCOUNTS': total_accounts,
+        'TOTAL TALK TIME': total_talk_time_str,
+        'AVG AGENTS/DAY': avg_agents_per_day,
+        'AVG CALLS/DAY': avg_calls_per_day,
+        'AVG CONNECTED/DAY': avg_connected_per_day,
+        'AVG ACCOUNTS/DAY': avg_accounts_per_day,
+        'AVG TALKTIME/DAY': avg_talktime_str
+    }])
+
+    
+    # 4. Overall Per Client Summary
+    client_summary = pd.DataFrame(columns=[
+        'CLIENT', 'DATE RANGE', 'ENVIRONMENT', 'COLLECTOR', 'TOTAL CONNECTED', 'TOTAL ACCOUNT', 'TOTAL TALK TIME',
+        'AVG AGENTS/DAY', 'AVG CALLS/DAY', 'AVG ACCOUNTS/DAY', 'AVG TALKTIME/DAY'
+    ])
+    
+    grouped_clients = df_filtered.groupby(df_filtered['Client'])
+    client_summary_data = []
+    for client, group in grouped_clients:
+        client_min_date = group['Date'].min()
+        client_max_date = group['Date'].max()
+        if pd.isna(client_min_date) or pd.isna(client_max_date):
+            client_date_range = "Invalid date range"
+        else:
+            client_min_date_str = client_min_date.strftime('%B %d, %Y')
+            client_max_date_str = client_max_date.strftime('%B %d, %Y')
+            client_date_range = f"{client_min_date_str} - {client_max_date_str}"
+        
+        environment = ', '.join(group['ENVIRONMENT'].unique())
+        unique_collectors = group['Collector'].nunique()
+        total_connected = group.shape[0]
+        total_accounts = group['Account'].nunique()
+        talk_times = pd.to_timedelta(group['Talk Time Duration'].astype(str))
+        total_talk_time = talk_times.sum()
+        
+        total_seconds = int(total_talk_time.total_seconds())
+        hours = total_seconds // 3600
+        minutes = (total_seconds % 3600) // 60
+        seconds = total_seconds % 60
+        total_talk_time_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+        
+        client_summary_subset = summary_table[summary_table['CLIENT'] == client]
+        avg_agents_per_day = math.ceil(client_summary_subset['COLLECTOR'].mean()) if client_summary_subset['COLLECTOR'].mean() % 1 >= 0.5 else round(client_summary_subset['COLLECTOR'].mean())
+        avg_calls_per_day = math.ceil(client_summary_subset['TOTAL CONNECTED'].mean()) if client_summary_subset['TOTAL CONNECTED'].mean() % 1 >= 0.5 else round(client_summary_subset['TOTAL CONNECTED'].mean())
+        avg_accounts_per_day = math.ceil(client_summary_subset['TOTAL ACCOUNT'].mean()) if client_summary_subset['TOTAL ACCOUNT'].mean() % 1 >= 0.5 else round(client_summary_subset['TOTAL ACCOUNT'].mean())
+        
+        client_avg_talktimes = client_summary_subset['AVG TALKTIME'].apply(str_to_timedelta)
+        avg_talktime_per_day = client_avg_talktimes.mean()
+        if pd.isna(avg_talktime_per_day):
+            avg_talktime_str = "00:00:00"
+        else:
+            avg_t_seconds = int(avg_talktime_per_day.total_seconds())
+            avg_hours = avg_t_seconds // 3600
+            avg_minutes = (avg_t_seconds % 3600) // 60
+            avg_seconds = avg_t_seconds % 60
+            avg_talktime_str = f"{avg_hours:02d}:{avg_minutes:02d}:{avg_seconds:02d}"
+        
+        client_summary_data.append({
+            'CLIENT': client,
+            'DATE RANGE': client_date_range,
+            'ENVIRONMENT': environment,
+            'COLLECTOR': unique_collectors,
+            'TOTAL CONNECTED': total_connected,
+            'TOTAL ACCOUNT': total_accounts,
+            'TOTAL TALK TIME': total_talk_time_str,
+            'AVG AGENTS/DAY': avg_agents_per_day,
+            'AVG CALLS/DAY': avg_calls_per_day,
+            'AVG ACCOUNTS/DAY': avg_accounts_per_day,
+            'AVG TALKTIME/DAY': avg_talktime_str
+        })
+    
+    client_summary = pd.DataFrame(client_summary_data)
+    return summary_table, daily_summary_table, overall_summary, client_summary
+
+# The collector leaderboard never had a per-group version in the app; this is the straightforward
+# one, written the same way as above, that the vectorized collector_summary is checked against
+def reference_collector_summary(df_filtered):
+    collector_data = []
+    grouped = df_filtered.groupby([df_filtered['Date'].dt.date, df_filtered['Client']])
+    for (date, client), group in grouped:
+        client_rows = []
+        for collector, collector_group in group.groupby('Collector'):
+            talk_times = pd.to_timedelta(collector_group['Talk Time Duration'].astype(str))
+            client_rows.append({
+                'Date': date,
+                'CLIENT': client,
+                'COLLECTOR': collector,
+                'TOTAL CONNECTED': collector_group.shape[0],
+                'TOTAL ACCOUNT': collector_group['Account'].nunique(),
+                'TALK SECONDS': int(talk_times.sum().total_seconds())
+            })
+        
+        client_rows.sort(key=lambda row: (-row['TOTAL CONNECTED'], -row['TALK SECONDS'], row['COLLECTOR']))
+        for position, row in enumerate(client_rows):
+            previous = client_rows[position - 1] if position > 0 else None
+            if previous and (previous['TOTAL CONNECTED'], previous['TALK SECONDS']) == (row['TOTAL CONNECTED'], row['TALK SECONDS']):
+                row['RANK'] = previous['RANK']
+            else:
+                row['RANK'] = position + 1
+        
+        for row in client_rows:
+            total_seconds = row.pop('TALK SECONDS')
+            hours = total_seconds // 3600
+            minutes = (total_seconds % 3600) // 60
+            seconds = total_seconds % 60
+            row['TOTAL TALK TIME'] = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+            collector_data.append(row)
+    
+    return pd.DataFrame(collector_data, columns=[
+        'Date', 'CLIENT', 'RANK', 'COLLECTOR', 'TOTAL CONNECTED', 'TOTAL ACCOUNT', 'TOTAL TALK TIME'
+    ])
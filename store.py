@@ -0,0 +1,265 @@
+import pandas as pd
+import pyarrow as pa
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from datetime import datetime
+
+# Everything on disk lives next to the app unless overridden through the environment
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Content hash used to key both the ingest cache and the aggregate store
+def content_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+# On-disk Parquet cache of parsed uploads, shared across sessions and restarts
+INGEST_CACHE_DIR = os.environ.get(
+    'SPM_INGEST_CACHE_DIR', os.path.join(APP_DIR, '.ingest_cache')
+)
+INGEST_CACHE_MAX_BYTES = int(os.environ.get('SPM_INGEST_CACHE_MAX_MB', '1024')) * 1024 * 1024
+
+# Bump when the shape of the cached frame changes so stale entries are never read back
+INGEST_CACHE_VERSION = 5
+
+def ingest_cache_path(digest):
+    return os.path.join(INGEST_CACHE_DIR, f"{digest}-v{INGEST_CACHE_VERSION}.parquet")
+
+# Return the cached frame for a content hash, or None on a miss
+def read_ingest_cache(digest):
+    path = ingest_cache_path(digest)
+    if not os.path.exists(path):
+        return None
+    try:
+        df = pd.read_parquet(path)
+    except (OSError, ValueError, ImportError):
+        # Unreadable entry (partial write, pyarrow upgrade, ...): drop it and re-parse
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    # Touch the entry so eviction sees it as recently used
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return df
+
+# Store a parsed frame (and its sheet row index) under its content hash, then trim the cache back
+# under its size limit.
+# Frames pyarrow can't represent (e.g. mixed-type object columns) are simply not cached.
+def write_ingest_cache(digest, df):
+    path = ingest_cache_path(digest)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(INGEST_CACHE_DIR, exist_ok=True)
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+    except (OSError, ValueError, TypeError, ImportError):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+    evict_ingest_cache()
+
+# Remove least recently used entries until the cache fits in INGEST_CACHE_MAX_BYTES
+def evict_ingest_cache():
+    entries = []
+    for name in os.listdir(INGEST_CACHE_DIR):
+        if name.endswith('.parquet'):
+            path = os.path.join(INGEST_CACHE_DIR, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= INGEST_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+# Memory-mapped Arrow snapshots of frames every session reads (the drill-down cube), keyed by a hash
+# of the exports they cover. A snapshot is written once as an uncompressed Arrow IPC file; opening it
+# maps the file, so numeric columns and category codes are views of the OS page cache rather than a
+# copy per session. Opened frames are tracked by weak reference: while any session holds a frame,
+# every other session gets the same object, and once none does it is unmapped. Files nobody has
+# opened for SHARED_FRAME_TTL_HOURS are deleted.
+SHARED_FRAME_DIR = os.environ.get('SPM_SHARED_FRAME_DIR', os.path.join(APP_DIR, '.shared_frames'))
+SHARED_FRAME_TTL_SECONDS = float(os.environ.get('SPM_SHARED_FRAME_TTL_HOURS', '12')) * 3600
+
+_open_frames = weakref.WeakValueDictionary()
+_open_frames_lock = threading.Lock()
+
+def shared_frame_key(digests):
+    return content_digest('\n'.join(digests).encode())
+
+def shared_frame_path(key):
+    return os.path.join(SHARED_FRAME_DIR, f"{key}.arrow")
+
+# Return the frame for a key, mapping its snapshot if no session has it open yet; None on a miss.
+# The frame's arrays are read-only views of the file.
+def open_shared_frame(key):
+    with _open_frames_lock:
+        df = _open_frames.get(key)
+        if df is not None:
+            return df
+        path = shared_frame_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+        except (OSError, pa.ArrowInvalid):
+            # Unreadable snapshot (partial write, format change, ...): drop it and rebuild
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        df = table.to_pandas(split_blocks=True)
+        _open_frames[key] = df
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return df
+
+# Snapshot a frame under its key, then delete expired snapshots. Returns False when the frame
+# couldn't be written (the caller keeps using its own copy).
+def write_shared_frame(key, df):
+    path = shared_frame_path(key)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(SHARED_FRAME_DIR, exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+    except (OSError, pa.ArrowException):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    sweep_shared_frames()
+    return True
+
+# Delete snapshots that no session in this process holds and that weren't opened within the TTL
+def sweep_shared_frames():
+    expired_before = time.time() - SHARED_FRAME_TTL_SECONDS
+    for name in os.listdir(SHARED_FRAME_DIR):
+        if not name.endswith('.arrow') or name[:-len('.arrow')] in _open_frames:
+            continue
+        path = os.path.join(SHARED_FRAME_DIR, name)
+        try:
+            if os.stat(path).st_mtime < expired_before:
+                os.remove(path)
+        except OSError:
+            pass
+
+# SQLite store of per-(date, client, environment, collector, account) partial aggregates.
+# Each uploaded export is reduced once and appended under its content digest, so adding a day
+# only costs that day's parsing. Value columns are declared without a type so SQLite keeps
+# ints and strings apart exactly as they were read from the workbook.
+AGGREGATE_STORE_PATH = os.environ.get('SPM_AGGREGATE_STORE', os.path.join(APP_DIR, 'aggregate_store.sqlite3'))
+
+PARTIAL_COLUMNS = ['Date', 'Client', 'ENVIRONMENT', 'Collector', 'Account', 'Calls', 'Seconds']
+INVALID_ROW_COLUMNS = ['Row', 'Date', 'Client', 'ENVIRONMENT', 'Collector', 'Account', 'Role', 'Talk Time Duration']
+
+def connect_store(path=None):
+    conn = sqlite3.connect(path or AGGREGATE_STORE_PATH, timeout=30)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS sources (
+            digest TEXT PRIMARY KEY, file_name TEXT, partial_rows INTEGER, ingested_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS partials (
+            digest, seq, Date, Client, ENVIRONMENT, Collector, Account, Calls, Seconds
+        );
+        CREATE INDEX IF NOT EXISTS partials_digest ON partials (digest, seq);
+        CREATE TABLE IF NOT EXISTS invalid_rows (
+            digest, seq, Row, Date, Client, ENVIRONMENT, Collector, Account, Role, "Talk Time Duration"
+        );
+        CREATE INDEX IF NOT EXISTS invalid_rows_digest ON invalid_rows (digest, seq);
+    """)
+    # Stores created before invalid rows kept their sheet row number
+    if 'Row' not in [column for _, column, *_ in conn.execute("PRAGMA table_info(invalid_rows)")]:
+        conn.execute("ALTER TABLE invalid_rows ADD COLUMN Row")
+    return conn
+
+def is_stored(conn, digest):
+    return conn.execute("SELECT 1 FROM sources WHERE digest = ?", (digest,)).fetchone() is not None
+
+# Digests of every stored export, oldest first
+def stored_digests(conn):
+    return [digest for digest, in conn.execute("SELECT digest FROM sources ORDER BY ingested_at, rowid")]
+
+# Append one export's partials (and its unparseable-date rows, kept as text for display)
+def store_partials(conn, digest, file_name, partials, invalid_rows):
+    partials = partials[PARTIAL_COLUMNS].copy()
+    partials['Date'] = partials['Date'].dt.strftime('%Y-%m-%d')
+    partials.insert(0, 'seq', range(len(partials)))
+    partials.insert(0, 'digest', digest)
+    invalid_rows = invalid_rows.astype(str)
+    invalid_rows.insert(0, 'seq', range(len(invalid_rows)))
+    invalid_rows.insert(0, 'digest', digest)
+    
+    with conn:
+        conn.execute("DELETE FROM partials WHERE digest = ?", (digest,))
+        conn.execute("DELETE FROM invalid_rows WHERE digest = ?", (digest,))
+        partials.to_sql('partials', conn, if_exists='append', index=False)
+        invalid_rows.to_sql('invalid_rows', conn, if_exists='append', index=False)
+        conn.execute(
+            "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)",
+            (digest, file_name, len(partials), datetime.now().isoformat(timespec='seconds'))
+        )
+
+# Partials for the given exports, in the order given and in original row order within each
+def load_partials(conn, digests):
+    frames = [
+        pd.read_sql_query(
+            f"SELECT {', '.join(PARTIAL_COLUMNS)} FROM partials WHERE digest = ? ORDER BY seq", conn, params=(digest,)
+        )
+        for digest in digests
+    ]
+    if not frames:
+        return pd.DataFrame(columns=PARTIAL_COLUMNS)
+    partials = pd.concat(frames, ignore_index=True)
+    partials['Date'] = pd.to_datetime(partials['Date'], format='%Y-%m-%d')
+    return partials
+
+# Unparseable-date rows of the given exports with the file they came from, in the order given.
+# limit caps the rows returned (a preview); count_invalid_rows gives the full count.
+def load_invalid_rows(conn, digests, limit=None):
+    frames = []
+    for digest in digests:
+        if limit is not None and limit <= 0:
+            break
+        frames.append(pd.read_sql_query(
+            f"""
+            SELECT sources.file_name AS File, {', '.join(f'"{column}"' for column in INVALID_ROW_COLUMNS)}
+            FROM invalid_rows JOIN sources USING (digest)
+            WHERE digest = ? ORDER BY seq {'' if limit is None else 'LIMIT ?'}
+            """,
+            conn, params=(digest,) if limit is None else (digest, limit)
+        ))
+        if limit is not None:
+            limit -= len(frames[-1])
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+def count_invalid_rows(conn, digests):
+    return sum(
+        conn.execute("SELECT COUNT(*) FROM invalid_rows WHERE digest = ?", (digest,)).fetchone()[0]
+        for digest in digests
+    )
+
+def clear_store(conn):
+    with conn:
+        conn.execute("DELETE FROM partials")
+        conn.execute("DELETE FROM invalid_rows")
+        conn.execute("DELETE FROM sources")